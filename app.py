@@ -1,35 +1,110 @@
-from fastapi import FastAPI, Request, Form, BackgroundTasks, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse, RedirectResponse, JSONResponse
+from fastapi import FastAPI, Request, Form, HTTPException, Query
+from fastapi.responses import HTMLResponse, FileResponse, RedirectResponse, JSONResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime
+import asyncio
+import json
+import os
 import uuid
 import re
 import threading
 from urllib.parse import urlparse
-from datetime import datetime
-from recon_core import run_recon_and_write_html, get_tools_list, get_tool, run_single_tool, render_report_html, safe_report_filename
-from starlette.templating import Jinja2Templates
-from jinja2 import Environment, FileSystemLoader, select_autoescape
-
-app = FastAPI()
-templates = Jinja2Templates(directory="templates")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+from recon_core import run_recon_and_write_html, get_tools_list, get_tool, run_single_tool, safe_report_filename, discover_tools, get_report_env, output_dir, write_report, stored_report_html, stream_stored_report, SPILL_RE
+from wordlists import available_tiers as wordlist_tiers
+import blob_store
+import checkpoints
+import export
+import job_queue
+import retention
+import scheduler
+import search_index
+import tracing
 
 
 DATA_DIR = Path("/data")
-DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+# With SABERRECON_FAST_START=1 the server starts accepting requests right away
+# and warms up in the background; /readyz reports when warm-up is done.
+FAST_START = os.environ.get("SABERRECON_FAST_START", "") not in ("", "0", "false")
+
+# Scans interrupted by a restart are picked up again from their checkpoints
+# on startup unless SABERRECON_AUTO_RESUME=0.
+AUTO_RESUME = os.environ.get("SABERRECON_AUTO_RESUME", "1") not in ("", "0", "false")
 
 SAFE_NAME_RE = re.compile(r"^[a-zA-Z0-9_.-]+$")
 
 JOBS = {}
 JOBS_LOCK = threading.Lock()
 
-env = Environment(
-    loader=FileSystemLoader("templates"),
-    autoescape=select_autoescape(["html", "xml"]),
-)
+READY = threading.Event()
+WARMUP = {"tools": {}, "error": None}
+
+
+def warm_up():
+    try:
+        for name in templates.env.list_templates():
+            templates.env.get_template(name)
+        get_report_env().get_template("report_template.html")
+        WARMUP["tools"] = discover_tools()
+    except Exception as e:
+        WARMUP["error"] = str(e)
+    finally:
+        READY.set()
+
+
+def maintain_storage():
+    # Repair blob reference counts, drop unreferenced blobs, and backfill the
+    # search index from reports written before it existed.
+    try:
+        blob_store.rebuild_refs()
+        blob_store.gc()
+    except Exception:
+        pass
+    search_index.sync(report_sources())
+
+
+def on_startup():
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    # Backfill the search index from reports written before it existed.
+    threading.Thread(target=maintain_storage, name="storage-maintenance", daemon=True).start()
+    retention.start(DATA_DIR, skip=active_filenames)
+    scheduler.start(launch_scheduled, is_job_active)
+    if AUTO_RESUME:
+        for ckpt in checkpoints.list_all():
+            if checkpoints.auto_resumable(ckpt):
+                resume_scan(ckpt)
+    if FAST_START:
+        threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+    else:
+        warm_up()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    on_startup()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+templates = Jinja2Templates(directory="templates")
+app.mount("/static", StaticFiles(directory="static"), name="static")
+
+
+@app.get("/healthz")
+def healthz():
+    return JSONResponse({"status": "ok"})
+
+
+@app.get("/readyz")
+def readyz():
+    if not READY.is_set():
+        return JSONResponse({"status": "warming"}, status_code=503)
+    missing = sorted(name for name, path in WARMUP["tools"].items() if path is None)
+    return JSONResponse({"status": "ready", "missing_tools": missing, "error": WARMUP["error"]})
 
 @app.get("/tools", response_class=HTMLResponse)
 def tools_list_page(request: Request):
@@ -63,19 +138,18 @@ async def run_tool(request: Request):
 
     selected = {k: v for k, v in form_dict.items() if k not in ("tool_id", "target")}
 
-    result = run_single_tool(target=target, tool_id=tool_id, selected=selected)
-
-    html = render_report_html(
-        target=result["target"],
-        domain=result["domain"],
-        sections=[result["section"]],
+    # Runs ahead of queued scans so the tool page stays responsive.
+    fut = job_queue.submit(
+        run_single_tool, target=target, tool_id=tool_id, selected=selected,
+        priority=job_queue.INTERACTIVE, name=f"{tool_id} {target}",
     )
+    try:
+        result = await asyncio.wrap_future(fut)
+    except ValueError as e:
+        return HTMLResponse(str(e), status_code=400)
 
-    out_dir = Path("/data")
-    out_dir.mkdir(parents=True, exist_ok=True)
-    filename = f"{tool_id}-{datetime.now().strftime('%m-%d-%Y-%H%M')}.html"
-    out_path = out_dir / filename
-    out_path.write_text(html, encoding="utf-8")
+    filename = f"{tool_id}-{timestamp_for_filename()}-{uuid.uuid4().hex[:6]}.html"
+    write_report(DATA_DIR / filename, result["target"], result["domain"], result["sections"])
 
     return RedirectResponse(url=f"/view/{filename}", status_code=303)
 
@@ -114,14 +188,80 @@ def safe_resolve_report(filename: str) -> Path:
     return p
 
 
+# Reports live in the blob store as manifests; reports written before that
+# are plain HTML files in DATA_DIR. Returns the manifest or the HTML file.
+def resolve_report(filename: str) -> Path:
+    if not SAFE_NAME_RE.match(filename):
+        raise ValueError("Invalid filename.")
+    manifest = blob_store.manifest_path(filename)
+    if manifest.is_file():
+        return manifest
+    return safe_resolve_report(filename)
+
+
+def is_manifest(p: Path) -> bool:
+    return p.suffix == ".json"
+
+
+def report_path(filename: str) -> Path:
+    try:
+        return resolve_report(filename)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid report name")
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+
+def report_html(filename: str) -> str:
+    p = report_path(filename)
+    html = stored_report_html(filename) if is_manifest(p) else p.read_text(errors="replace")
+    # The manifest can be removed (e.g. by retention) after it was resolved.
+    if html is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return html
+
+
+def report_files() -> dict:
+    files = {p.name: p for p in DATA_DIR.glob("*.html")}
+    for p in blob_store.list_manifests():
+        files[p.name[:-len(".json")]] = p
+    return files
+
+
+def load_report_data(p: Path) -> tuple[str, str, list[dict]]:
+    if is_manifest(p):
+        manifest = json.loads(p.read_text())
+        return manifest["target"], manifest["domain"], blob_store.load_sections(manifest)
+    return search_index.parse_report_html(p.read_text(errors="replace"))
+
+
+def report_sources() -> dict:
+    sources = {}
+    for name, p in report_files().items():
+        try:
+            sources[name] = (p.stat().st_mtime, lambda p=p: load_report_data(p))
+        except OSError:
+            continue
+    return sources
+
+
+def report_size(p: Path) -> int:
+    if not is_manifest(p):
+        return p.stat().st_size
+    try:
+        return sum(s.get("size", 0) for s in json.loads(p.read_text()).get("sections", []))
+    except (OSError, ValueError):
+        return 0
+
+
 def list_reports():
     items = []
-    for p in sorted(DATA_DIR.glob("*.html"), key=lambda x: x.stat().st_mtime, reverse=True):
+    for name, p in sorted(report_files().items(), key=lambda x: x[1].stat().st_mtime, reverse=True):
         st = p.stat()
         items.append(
             {
-                "name": p.name,
-                "size": st.st_size,
+                "name": name,
+                "size": report_size(p),
                 "mtime": datetime.fromtimestamp(st.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
             }
         )
@@ -132,36 +272,92 @@ def set_job(job_id: str, **kwargs):
         JOBS.setdefault(job_id, {})
         JOBS[job_id].update(kwargs)
 
-def run_job(job_id: str, target: str, filename: str):
+def run_job(job_id: str, target: str, filename: str, wordlist: str = "common", trace: bool = False, profile: bool = False):
     out_path = DATA_DIR / filename
 
     def progress_cb(payload):
         set_job(job_id, status="running", **payload)
 
-    try:
+    def scan():
         set_job(job_id, status="running", percent=0, stage="Starting...", current=0, total=0, filename=filename, target=target)
-        run_recon_and_write_html(target=target, output_html_path=out_path, progress_cb=progress_cb)
+        run_recon_and_write_html(target=target, output_html_path=out_path, progress_cb=progress_cb, wordlist_tier=wordlist)
+
+    profile = profile or tracing.PROFILE_ALL
+    trace = trace or profile or tracing.TRACE_ALL
+    if trace:
+        # The files are written before the job is marked done or failed.
+        set_job(job_id, trace=f"/api/trace/{job_id}", profile=f"/api/trace/{job_id}/profile" if profile else None)
+    try:
+        if trace:
+            with tracing.trace(job_id, profile=profile, target=target, wordlist=wordlist) as t:
+                if profile and not t.profile:
+                    set_job(job_id, profile=None, trace_notes=t.notes)
+                scan()
+        else:
+            scan()
         set_job(job_id, status="done", percent=100, stage="Done", filename=filename)
     except Exception as e:
         set_job(job_id, status="error", error=str(e), percent=100, stage="Error")
 
+def active_filenames() -> set:
+    with JOBS_LOCK:
+        return {j.get("filename") for j in JOBS.values() if j.get("status") in ("queued", "running")}
+
+
+def interrupted_scans() -> list[dict]:
+    active = active_filenames()
+    return [c for c in checkpoints.list_all() if c["filename"] not in active]
+
+
+def resume_scan(ckpt: dict) -> str:
+    job_id = uuid.uuid4().hex[:12]
+    filename = ckpt["filename"]
+    set_job(job_id, status="queued", percent=0, stage="Queued (resuming)", current=0, total=0, filename=filename, target=ckpt["target"])
+    job_queue.submit(run_job, job_id, ckpt["target"], filename, ckpt["wordlist"], priority=job_queue.SCAN, name=f"resume {ckpt['target']}")
+    return job_id
+
+
+@app.post("/resume/{filename}")
+def resume(filename: str):
+    ckpt = next((c for c in interrupted_scans() if c["filename"] == filename), None)
+    if ckpt is None:
+        raise HTTPException(status_code=404, detail="No interrupted scan for this report")
+    if not ckpt["resumable"]:
+        raise HTTPException(status_code=409, detail=f"Scan already tried {ckpt['attempts']} times; start a new scan instead")
+    job_id = resume_scan(ckpt)
+    return RedirectResponse(url=f"/progress/{job_id}", status_code=303)
+
+
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse("index.html", {"request": request, "wordlist_tiers": wordlist_tiers()})
 
-@app.post("/run", response_class=HTMLResponse)
-def run_scan(request: Request, background_tasks: BackgroundTasks, target: str = Form(...)):
+def queue_scan(target: str, wordlist: str, priority: int = job_queue.SCAN, stage: str = "Queued", trace: bool = False, profile: bool = False) -> str:
     job_id = uuid.uuid4().hex[:12]
-    
-    base = normalize_domain_for_filename(target)
-    ts = timestamp_for_filename()
-    
-    filename = f"{base}-{ts}.html"
-    
-    set_job(job_id, status="queued", percent=0, stage="Queued", current=0, total=0, filename=filename, target=target)
+    filename = f"{normalize_domain_for_filename(target)}-{timestamp_for_filename()}-{uuid.uuid4().hex[:6]}.html"
+    set_job(job_id, status="queued", percent=0, stage=stage, current=0, total=0, filename=filename, target=target)
+    job_queue.submit(run_job, job_id, target, filename, wordlist, trace=trace, profile=profile, priority=priority, name=f"scan {target}")
+    return job_id
 
-    background_tasks.add_task(run_job, job_id, target, filename)
 
+def launch_scheduled(schedule: dict) -> str:
+    return queue_scan(schedule["target"], schedule["wordlist"], priority=job_queue.RECURRING, stage="Queued (scheduled)")
+
+
+def is_job_active(job_id: str) -> bool:
+    with JOBS_LOCK:
+        return JOBS.get(job_id, {}).get("status") in ("queued", "running")
+
+
+@app.post("/run", response_class=HTMLResponse)
+def run_scan(request: Request, target: str = Form(...), wordlist: str = Form("common"), trace: bool = Form(False), profile: bool = Form(False)):
+    if wordlist not in wordlist_tiers():
+        raise HTTPException(status_code=400, detail="Unknown wordlist tier")
+    # Only one job can be profiled at a time (cProfile is process-wide on 3.12).
+    if profile and tracing.profiling_active():
+        raise HTTPException(status_code=409, detail="Another profiled scan is running; try again when it finishes.")
+
+    job_id = queue_scan(target, wordlist, trace=trace, profile=profile)
     return RedirectResponse(url=f"/progress/{job_id}", status_code=303)
 
 
@@ -179,20 +375,227 @@ def job_status(job_id: str):
     return JSONResponse(job)
 
 
+@app.get("/api/trace/{job_id}")
+def trace_download(job_id: str):
+    try:
+        p = tracing.trace_path(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid job id")
+    if not p.is_file():
+        raise HTTPException(status_code=404, detail="No trace for this job")
+    return FileResponse(p, media_type="application/json", filename=f"trace-{job_id}.json")
+
+
+@app.get("/api/trace/{job_id}/profile")
+def profile_download(job_id: str, format: str = "text", sort: str = "cumulative"):
+    try:
+        p = tracing.profile_path(job_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid job id")
+    if not p.is_file():
+        raise HTTPException(status_code=404, detail="No profile for this job")
+    if format == "prof":
+        return FileResponse(p, media_type="application/octet-stream", filename=f"profile-{job_id}.prof")
+    if sort not in ("cumulative", "tottime", "calls"):
+        raise HTTPException(status_code=400, detail="sort must be cumulative, tottime or calls")
+    return Response(content=tracing.profile_text(job_id, sort=sort), media_type="text/plain; charset=utf-8")
+
+
+@app.get("/api/queue")
+def queue_status():
+    return JSONResponse(job_queue.snapshot())
+
+
+@app.get("/api/retention")
+def retention_status():
+    return JSONResponse({"policy": retention.policy(), "status": retention.STATUS})
+
+
+@app.post("/api/retention/run")
+def retention_run():
+    job_queue.submit(retention.run_once, DATA_DIR, skip=active_filenames(), priority=job_queue.BATCH, name="retention")
+    return JSONResponse({"status": "queued"}, status_code=202)
+
+
+@app.get("/api/schedules")
+def schedules_list():
+    return JSONResponse({"schedules": scheduler.list_all(), "max_concurrent": scheduler.MAX_CONCURRENT})
+
+
+@app.post("/schedules")
+def schedules_add(target: str = Form(...), wordlist: str = Form("common"), interval_minutes: int = Form(...)):
+    if wordlist not in wordlist_tiers():
+        raise HTTPException(status_code=400, detail="Unknown wordlist tier")
+    try:
+        scheduler.add(target.strip(), wordlist, interval_minutes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return RedirectResponse(url="/history", status_code=303)
+
+
+@app.post("/schedules/{schedule_id}/toggle")
+def schedules_toggle(schedule_id: str):
+    s = next((s for s in scheduler.list_all() if s["id"] == schedule_id), None)
+    if s is None or not scheduler.set_enabled(schedule_id, not s["enabled"]):
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return RedirectResponse(url="/history", status_code=303)
+
+
+@app.post("/schedules/{schedule_id}/delete")
+def schedules_delete(schedule_id: str):
+    if not scheduler.remove(schedule_id):
+        raise HTTPException(status_code=404, detail="Schedule not found")
+    return RedirectResponse(url="/history", status_code=303)
+
+
 @app.get("/history", response_class=HTMLResponse)
 def history(request: Request):
     reports = list_reports()
-    return templates.TemplateResponse("history.html", {"request": request, "reports": reports})
+    return templates.TemplateResponse(
+        "history.html",
+        {
+            "request": request,
+            "reports": reports,
+            "interrupted": interrupted_scans(),
+            "max_attempts": checkpoints.MAX_ATTEMPTS,
+            "schedules": scheduler.list_all(),
+            "wordlist_tiers": wordlist_tiers(),
+        },
+    )
+
+
+@app.get("/search", response_class=HTMLResponse)
+def search_page(request: Request, q: str = "", page: int = 1):
+    page = max(1, page)
+    found = search_index.search(q, offset=(page - 1) * search_index.SEARCH_LIMIT) if q.strip() else None
+    return templates.TemplateResponse(
+        "search.html",
+        {"request": request, "q": q, "page": page, "found": found, "per_page": search_index.SEARCH_LIMIT},
+    )
+
+
+@app.get("/api/search")
+def search_api(q: str, limit: int = 20, offset: int = 0):
+    return JSONResponse(search_index.search(q, limit=max(1, min(limit, 200)), offset=max(0, offset)))
+
+
+SECTION_PAGE_MAX = 5000
+
+
+# Parsed once per report version; the lazy view and its API read from here
+# instead of shipping the whole report to the browser.
+@lru_cache(maxsize=8)
+def parse_report(path: str, mtime: float) -> dict:
+    target, domain, sections = load_report_data(Path(path))
+    for s in sections:
+        m = SPILL_RE.search(s["output"])
+        s["full_output"] = m.group(1) if m else None
+        s["lines"] = s["output"].splitlines()
+    return {"target": target, "domain": domain, "sections": sections}
+
+
+def load_report(filename: str) -> tuple[Path, dict]:
+    p = report_path(filename)
+    return p, parse_report(str(p), p.stat().st_mtime)
+
+
+def section_summaries(report: dict) -> list[dict]:
+    return [
+        {"index": i, "title": s["title"], "command": s["command"], "lines": len(s["lines"]), "full_output": s["full_output"]}
+        for i, s in enumerate(report["sections"])
+    ]
 
 
 @app.get("/view/{filename}", response_class=HTMLResponse)
-def view_report(request: Request, filename: str):
-    report_path = safe_resolve_report(filename)
-    html = report_path.read_text(errors="replace")
-    return HTMLResponse(content=html)
+def view_report(request: Request, filename: str, full: bool = False):
+    if full:
+        return HTMLResponse(content=report_html(filename))
+
+    p, report = load_report(filename)
+    return templates.TemplateResponse(
+        "report_view.html",
+        {
+            "request": request,
+            "filename": filename,
+            "target": report["target"],
+            "domain": report["domain"],
+            "timestamp": datetime.fromtimestamp(p.stat().st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
+            "sections": section_summaries(report),
+        },
+    )
+
+
+@app.get("/api/report/{filename}")
+def report_api(filename: str):
+    _, report = load_report(filename)
+    return JSONResponse({"name": filename, "target": report["target"], "domain": report["domain"], "sections": section_summaries(report)})
+
+
+@app.get("/api/report/{filename}/sections/{index}")
+def report_section_api(filename: str, index: int, offset: int = 0, limit: int = 500):
+    _, report = load_report(filename)
+    if not 0 <= index < len(report["sections"]):
+        raise HTTPException(status_code=404, detail="Section not found")
+    lines = report["sections"][index]["lines"]
+    offset = max(0, offset)
+    limit = max(1, min(limit, SECTION_PAGE_MAX))
+    return JSONResponse({"offset": offset, "limit": limit, "total": len(lines), "lines": lines[offset:offset + limit]})
+
+
+@app.get("/output/{name}")
+def full_output(name: str):
+    if not SAFE_NAME_RE.match(name) or not name.endswith(".log"):
+        raise HTTPException(status_code=400, detail="Invalid output name")
+    p = output_dir() / name
+    if not p.is_file():
+        raise HTTPException(status_code=404, detail="Output not found")
+    return FileResponse(p, media_type="text/plain; charset=utf-8")
 
 
 @app.get("/download/{filename}")
 def download_report(filename: str):
-    report_path = safe_resolve_report(filename)
-    return FileResponse(report_path, media_type="text/html", filename=report_path.name)
+    p = report_path(filename)
+    if not is_manifest(p):
+        return FileResponse(p, media_type="text/html", filename=filename)
+    chunks = stream_stored_report(filename)
+    if chunks is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return StreamingResponse(
+        chunks,
+        media_type="text/html; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+# Streams an archive of the selected reports; each report is rendered and
+# compressed as it is sent, so the archive is never held in memory or on disk.
+@app.get("/export")
+def export_reports(
+    target: str = "",
+    since: str = "",
+    until: str = "",
+    names: list[str] = Query(default=[]),
+    format: str = "zip",
+    data: str = "none",
+):
+    if format not in export.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be zip or tar.gz")
+    if data not in export.DATA_FORMATS:
+        raise HTTPException(status_code=400, detail="data must be none, json or csv")
+    if any(not SAFE_NAME_RE.match(n) for n in names):
+        raise HTTPException(status_code=400, detail="Invalid report name")
+    try:
+        reports = export.select_reports(retention.collect_reports(DATA_DIR), target, since, until, names)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be YYYY-MM-DD")
+    skip = active_filenames()
+    reports = [r for r in reports if r["name"] not in skip]
+    if not reports:
+        raise HTTPException(status_code=404, detail="No reports match")
+
+    filename = f"saberrecon-export-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{format}"
+    return StreamingResponse(
+        export.stream(reports, format, data),
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
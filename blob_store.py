@@ -0,0 +1,230 @@
+from datetime import datetime
+from pathlib import Path
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+
+# Section outputs and report assets are stored once, named by the SHA-256
+# of their content. A report is a small JSON manifest that references them.
+STORE_DIR = Path("/data") / ".store"
+
+# Blobs with no reference row are only removed once they are this old, so a
+# blob written just before its manifest is never collected.
+ORPHAN_GRACE_SECONDS = 3600
+
+_LOCK = threading.RLock()
+_CONN = None
+_ROOT = None
+
+
+def store_dir() -> Path:
+    global _ROOT
+    if _ROOT is None:
+        try:
+            STORE_DIR.mkdir(parents=True, exist_ok=True)
+            _ROOT = STORE_DIR
+        except OSError:
+            _ROOT = Path(tempfile.gettempdir()) / "saberrecon-store"
+            _ROOT.mkdir(parents=True, exist_ok=True)
+    return _ROOT
+
+
+def _db() -> sqlite3.Connection:
+    global _CONN
+    if _CONN is None:
+        conn = sqlite3.connect(store_dir() / "refs.db", check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS refs (hash TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+        _CONN = conn
+    return _CONN
+
+
+def blob_path(digest: str) -> Path:
+    return store_dir() / "blobs" / digest[:2] / digest[2:]
+
+
+def manifest_path(name: str) -> Path:
+    d = store_dir() / "manifests"
+    d.mkdir(parents=True, exist_ok=True)
+    return d / f"{name}.json"
+
+
+def _atomic_write(p: Path, data: bytes) -> None:
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(f".{p.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    tmp.replace(p)
+
+
+def put(data: bytes) -> str:
+    digest = hashlib.sha256(data).hexdigest()
+    p = blob_path(digest)
+    if not p.exists():
+        _atomic_write(p, zlib.compress(data, 6))
+    return digest
+
+
+def put_text(text: str) -> str:
+    return put(text.encode("utf-8"))
+
+
+def get(digest: str) -> bytes:
+    return zlib.decompress(blob_path(digest).read_bytes())
+
+
+def get_text(digest: str) -> str:
+    return get(digest).decode("utf-8", errors="replace")
+
+
+def manifest_refs(manifest: dict) -> list[str]:
+    refs = [s["output"] for s in manifest.get("sections", [])]
+    refs += list(manifest.get("assets", {}).values())
+    return refs
+
+
+def _adjust(refs, delta: int) -> None:
+    conn = _db()
+    with conn:
+        for digest in refs:
+            conn.execute(
+                "INSERT INTO refs (hash, count) VALUES (?, ?) ON CONFLICT(hash) DO UPDATE SET count = count + ?",
+                (digest, delta, delta),
+            )
+
+
+def save_report(name: str, target: str, domain: str, sections: list[dict], assets: dict | None = None, timestamp: str | None = None) -> Path:
+    with _LOCK:
+        return _save_report(name, target, domain, sections, assets, timestamp)
+
+
+# Runs under _LOCK so gc() can't drop an existing blob between put() finding
+# it and the new reference being counted.
+def _save_report(name, target, domain, sections, assets, timestamp) -> Path:
+    manifest = {
+        "version": 1,
+        "name": name,
+        "target": target,
+        "domain": domain,
+        "timestamp": timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "sections": [
+            {"title": s["title"], "command": s["command"], "output": put_text(s["output"]), "size": len(s["output"])}
+            for s in sections
+        ],
+        "assets": {key: put(data) for key, data in (assets or {}).items()},
+    }
+
+    old = load_manifest(name)
+    _adjust(manifest_refs(manifest), 1)
+    p = manifest_path(name)
+    _atomic_write(p, json.dumps(manifest, indent=1).encode("utf-8"))
+    if old:
+        _adjust(manifest_refs(old), -1)
+    return p
+
+
+def load_manifest(name: str) -> dict | None:
+    try:
+        return json.loads(manifest_path(name).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def iter_sections(manifest: dict):
+    for s in manifest.get("sections", []):
+        yield {"title": s["title"], "command": s["command"], "output": get_text(s["output"])}
+
+
+def load_sections(manifest: dict) -> list[dict]:
+    return list(iter_sections(manifest))
+
+
+def delete_report(name: str) -> bool:
+    with _LOCK:
+        manifest = load_manifest(name)
+        if manifest is None:
+            return False
+        manifest_path(name).unlink()
+        _adjust(manifest_refs(manifest), -1)
+    return True
+
+
+def list_manifests() -> list[Path]:
+    d = store_dir() / "manifests"
+    return list(d.glob("*.json")) if d.is_dir() else []
+
+
+# Recomputes reference counts from the manifests on disk; used at startup
+# to repair counts left behind by a crash between a count update and the
+# manifest write. Scans and writes under _LOCK, so a report saved meanwhile
+# is either counted from its manifest or adjusts the rebuilt counts after.
+def rebuild_refs() -> None:
+    with _LOCK:
+        counts = {}
+        for p in list_manifests():
+            try:
+                manifest = json.loads(p.read_text())
+            except (OSError, ValueError):
+                continue
+            for digest in manifest_refs(manifest):
+                counts[digest] = counts.get(digest, 0) + 1
+        conn = _db()
+        with conn:
+            conn.execute("DELETE FROM refs")
+            conn.executemany("INSERT INTO refs (hash, count) VALUES (?, ?)", counts.items())
+
+
+def gc() -> dict:
+    removed = 0
+    freed = 0
+    with _LOCK:
+        conn = _db()
+        live = dict(conn.execute("SELECT hash, count FROM refs").fetchall())
+        dead = [digest for digest, count in live.items() if count <= 0]
+
+        blobs = store_dir() / "blobs"
+        now = time.time()
+        for p in blobs.glob("*/*") if blobs.is_dir() else []:
+            digest = p.parent.name + p.name
+            if digest in live and live[digest] > 0:
+                continue
+            try:
+                st = p.stat()
+                if digest not in live and now - st.st_mtime < ORPHAN_GRACE_SECONDS:
+                    continue
+                p.unlink()
+            except OSError:
+                continue
+            removed += 1
+            freed += st.st_size
+
+        with conn:
+            conn.executemany("DELETE FROM refs WHERE hash = ?", [(d,) for d in dead])
+    return {"removed": removed, "freed_bytes": freed}
+
+
+# Stored size of blobs some manifest still references.
+def referenced_bytes() -> int:
+    with _LOCK:
+        live = [digest for digest, in _db().execute("SELECT hash FROM refs WHERE count > 0").fetchall()]
+    total = 0
+    for digest in live:
+        try:
+            total += blob_path(digest).stat().st_size
+        except OSError:
+            continue
+    return total
+
+
+def stats() -> dict:
+    blobs = store_dir() / "blobs"
+    files = list(blobs.glob("*/*")) if blobs.is_dir() else []
+    return {
+        "reports": len(list_manifests()),
+        "blobs": len(files),
+        "blob_bytes": sum(p.stat().st_size for p in files),
+    }
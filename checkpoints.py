@@ -0,0 +1,81 @@
+from datetime import datetime
+from pathlib import Path
+import json
+import os
+import re
+import tempfile
+
+CHECKPOINT_DIR = Path("/data") / ".checkpoints"
+
+SAFE_NAME_RE = re.compile(r"^[a-zA-Z0-9_.-]+$")
+
+# A scan is run at most this many times from the same checkpoint; after that
+# it stays listed but can't be resumed, so a scan that always fails (or
+# crashes the process) isn't re-run forever.
+MAX_ATTEMPTS = 3
+
+
+def checkpoint_dir() -> Path:
+    try:
+        CHECKPOINT_DIR.mkdir(parents=True, exist_ok=True)
+        return CHECKPOINT_DIR
+    except OSError:
+        fallback = Path(tempfile.gettempdir()) / "saberrecon-checkpoints"
+        fallback.mkdir(parents=True, exist_ok=True)
+        return fallback
+
+
+def checkpoint_path(report_name: str) -> Path:
+    if not SAFE_NAME_RE.match(report_name):
+        raise ValueError("Invalid report name.")
+    return checkpoint_dir() / f"{report_name}.json"
+
+
+def load(report_name: str) -> dict | None:
+    try:
+        return json.loads(checkpoint_path(report_name).read_text())
+    except (OSError, ValueError):
+        return None
+
+
+# Written to a temp file and renamed, so a crash mid-write leaves the
+# previous checkpoint intact.
+def save(report_name: str, state: dict) -> None:
+    state["updated"] = datetime.now().isoformat(timespec="seconds")
+    p = checkpoint_path(report_name)
+    tmp = p.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(state, default=str))
+    tmp.replace(p)
+
+
+def remove(report_name: str) -> None:
+    try:
+        checkpoint_path(report_name).unlink()
+    except (OSError, ValueError):
+        pass
+
+
+def list_all() -> list[dict]:
+    items = []
+    for p in sorted(checkpoint_dir().glob("*.json"), key=lambda x: x.stat().st_mtime, reverse=True):
+        try:
+            state = json.loads(p.read_text())
+        except (OSError, ValueError):
+            continue
+        items.append({
+            "filename": state.get("filename", p.name[:-len(".json")]),
+            "target": state.get("target", ""),
+            "wordlist": state.get("wordlist", "common"),
+            "completed": len(state.get("results", {})),
+            "updated": state.get("updated", ""),
+            "attempts": state.get("attempts", 0),
+            "error": state.get("error"),
+            "resumable": state.get("attempts", 0) < MAX_ATTEMPTS,
+        })
+    return items
+
+
+# Only scans cut off by a restart are picked up automatically; one that
+# failed with an error waits for someone to resume it by hand.
+def auto_resumable(item: dict) -> bool:
+    return item["resumable"] and not item["error"]
@@ -0,0 +1,132 @@
+from datetime import datetime
+import csv
+import io
+import json
+import tarfile
+import time
+import zipfile
+
+import blob_store
+import search_index
+from retention import report_html
+
+FORMATS = {"zip": "application/zip", "tar.gz": "application/gzip"}
+DATA_FORMATS = ("none", "json", "csv")
+
+CHUNK_SIZE = 1024 * 1024
+
+
+# Write end of the export stream. zipfile and tarfile write into it and the
+# response generator drains it after every member, so only the member being
+# written is ever held in memory.
+class _Sink:
+    def __init__(self):
+        self.chunks = []
+        self.pos = 0
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.pos += len(data)
+        return len(data)
+
+    # No seek(): zipfile then writes data descriptors instead of going back.
+    def tell(self) -> int:
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def parse_date(value: str | None, end=False) -> float | None:
+    if not value:
+        return None
+    day = datetime.strptime(value, "%Y-%m-%d")
+    return day.timestamp() + (86400 if end else 0)
+
+
+def select_reports(reports: list[dict], target: str = "", since: str = "", until: str = "", names=()) -> list[dict]:
+    lo = parse_date(since)
+    hi = parse_date(until, end=True)
+    target = target.strip().lower()
+    names = set(names)
+    out = []
+    for r in reports:
+        if names and r["name"] not in names:
+            continue
+        if target and target not in (r["target"] or ""):
+            continue
+        if lo is not None and r["mtime"] < lo:
+            continue
+        if hi is not None and r["mtime"] >= hi:
+            continue
+        out.append(r)
+    return out
+
+
+def report_data(r: dict) -> tuple[str, str, list[dict]]:
+    if r["manifest"] is not None:
+        m = r["manifest"]
+        return m["target"], m["domain"], blob_store.load_sections(m)
+    return search_index.parse_report_html(r["path"].read_text(errors="replace"))
+
+
+def data_file(r: dict, fmt: str) -> tuple[str, bytes]:
+    target, domain, sections = report_data(r)
+    stem = r["name"].rsplit(".", 1)[0]
+    if fmt == "json":
+        doc = {"report": r["name"], "target": target, "domain": domain, "sections": sections}
+        return f"data/{stem}.json", json.dumps(doc, indent=1).encode("utf-8")
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["report", "target", "domain", "title", "command", "output"])
+    for s in sections:
+        writer.writerow([r["name"], target, domain, s["title"], s["command"], s["output"]])
+    return f"data/{stem}.csv", buf.getvalue().encode("utf-8")
+
+
+def members(reports: list[dict], data: str):
+    index = []
+    for r in reports:
+        yield f"reports/{r['name']}", r["mtime"], report_html(r).encode("utf-8")
+        if data != "none":
+            name, body = data_file(r, data)
+            yield name, r["mtime"], body
+        index.append({"name": r["name"], "target": r["target"], "modified": datetime.fromtimestamp(r["mtime"]).isoformat(timespec="seconds")})
+    yield "index.json", time.time(), json.dumps(index, indent=1).encode("utf-8")
+
+
+def stream_zip(reports: list[dict], data: str = "none"):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, mtime, body in members(reports, data):
+            info = zipfile.ZipInfo(name, date_time=time.localtime(mtime)[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with zf.open(info, "w", force_zip64=True) as f:
+                for i in range(0, len(body), CHUNK_SIZE):
+                    f.write(body[i:i + CHUNK_SIZE])
+                    yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream_tar(reports: list[dict], data: str = "none"):
+    sink = _Sink()
+    with tarfile.open(fileobj=sink, mode="w|gz") as tar:
+        for name, mtime, body in members(reports, data):
+            info = tarfile.TarInfo(name)
+            info.size = len(body)
+            info.mtime = int(mtime)
+            tar.addfile(info, io.BytesIO(body))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream(reports: list[dict], fmt: str = "zip", data: str = "none"):
+    gen = stream_zip(reports, data) if fmt == "zip" else stream_tar(reports, data)
+    return (chunk for chunk in gen if chunk)
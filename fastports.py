@@ -0,0 +1,177 @@
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import socket
+import time
+
+from nmap_planner import parse_port_spec
+
+# nmap's most frequently open TCP ports, most common first.
+TOP_PORTS = [
+    80, 23, 443, 21, 22, 25, 3389, 110, 445, 139, 143, 53, 135, 3306, 8080, 1723, 111, 995, 993, 5900,
+    1025, 587, 8888, 199, 1720, 465, 548, 113, 81, 6001, 10000, 514, 5060, 179, 1026, 2000, 8443, 8000, 32768, 554,
+    26, 1433, 49152, 2001, 515, 8008, 49154, 1027, 5666, 646, 5000, 5631, 631, 49153, 8081, 2049, 88, 79, 5800, 106,
+    2121, 1110, 49155, 6000, 513, 990, 5357, 427, 49156, 543, 544, 5101, 144, 7, 389, 8009, 3128, 444, 9999, 5009,
+    7070, 5190, 3000, 5432, 1900, 3986, 13, 1029, 9, 5051, 6646, 49157, 1028, 873, 1755, 2717, 4899, 9100, 119, 37,
+]
+
+DEFAULT_TOP_PORTS = 100
+DEFAULT_CONCURRENCY = 500
+DEFAULT_TIMEOUT = 1.0
+DEFAULT_RETRIES = 0
+
+
+def top_ports(n: int) -> list[int]:
+    if n <= len(TOP_PORTS):
+        return TOP_PORTS[:n]
+    seen = set(TOP_PORTS)
+    rest = (p for p in range(1, 65536) if p not in seen)
+    return TOP_PORTS + [next(rest) for _ in range(min(n, 65535) - len(TOP_PORTS))]
+
+
+def service_name(port: int) -> str:
+    try:
+        return socket.getservbyport(port, "tcp")
+    except OSError:
+        return "unknown"
+
+
+async def probe(addr: str, port: int, timeout: float, retries: int, sem: asyncio.Semaphore) -> tuple[int, str, float]:
+    state = "filtered"
+    latency = 0.0
+    for _ in range(retries + 1):
+        async with sem:
+            start = time.monotonic()
+            try:
+                _, writer = await asyncio.wait_for(asyncio.open_connection(addr, port), timeout)
+            except asyncio.TimeoutError:
+                state = "filtered"
+                continue
+            except ConnectionRefusedError:
+                return port, "closed", time.monotonic() - start
+            except OSError:
+                state = "filtered"
+                continue
+            latency = time.monotonic() - start
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+            return port, "open", latency
+    return port, state, latency
+
+
+async def scan_host(host: str, ports: list[int], timeout: float, retries: int, sem: asyncio.Semaphore) -> dict:
+    start = time.monotonic()
+    loop = asyncio.get_running_loop()
+    try:
+        infos = await asyncio.wait_for(loop.getaddrinfo(host, None, proto=socket.IPPROTO_TCP), 5.0)
+        addr = infos[0][4][0]
+    except (OSError, asyncio.TimeoutError) as e:
+        return {"host": host, "addr": None, "error": f"Failed to resolve \"{host}\" ({e})", "results": [], "elapsed": 0.0}
+
+    results = await asyncio.gather(*(probe(addr, p, timeout, retries, sem) for p in ports))
+    return {"host": host, "addr": addr, "error": None, "results": results, "elapsed": time.monotonic() - start}
+
+
+async def scan_hosts(hosts: list[str], ports: list[int], concurrency: int, timeout: float, retries: int) -> list[dict]:
+    sem = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*(scan_host(h, ports, timeout, retries, sem) for h in hosts))
+
+
+def format_host(scan: dict) -> list[str]:
+    if scan["error"]:
+        return [scan["error"]]
+
+    name = scan["host"] if scan["host"] == scan["addr"] else f"{scan['host']} ({scan['addr']})"
+    opened = [(p, lat) for p, state, lat in scan["results"] if state == "open"]
+    closed = sum(1 for _, state, _ in scan["results"] if state == "closed")
+    filtered = sum(1 for _, state, _ in scan["results"] if state == "filtered")
+
+    lines = [f"Nmap scan report for {name}"]
+    if opened or closed:
+        latency = min(lat for _, state, lat in scan["results"] if state != "filtered")
+        lines.append(f"Host is up ({latency:.3f}s latency).")
+    else:
+        lines.append("Host is up (no response to TCP connect; all ports filtered).")
+
+    hidden = []
+    if closed:
+        hidden.append(f"{closed} closed tcp port{'s' if closed != 1 else ''} (conn-refused)")
+    if filtered:
+        hidden.append(f"{filtered} filtered tcp port{'s' if filtered != 1 else ''} (no-response)")
+
+    if not opened:
+        lines.append(f"All {len(scan['results'])} scanned ports on {name} are in ignored states.")
+        if hidden:
+            lines.append("Not shown: " + ", ".join(hidden))
+        return lines
+
+    if hidden:
+        lines.append("Not shown: " + ", ".join(hidden))
+    width = max(len(f"{p}/tcp") for p, _ in opened)
+    lines.append(f"{'PORT'.ljust(width)} STATE SERVICE")
+    for p, _ in sorted(opened):
+        lines.append(f"{f'{p}/tcp'.ljust(width)} open  {service_name(p)}")
+    return lines
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="fastports", add_help=False)
+    parser.add_argument("--top-ports", type=int, default=DEFAULT_TOP_PORTS)
+    parser.add_argument("-p", dest="ports", default="")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    parser.add_argument("hosts", nargs="+")
+    return parser.parse_args(argv)
+
+
+# asyncio.run can't be called from a thread that already runs an event loop
+# (e.g. a handler on the server's loop); the scan then gets a thread of its own.
+def run_coro(coro):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+def main(argv: list[str], timeout: float = 90) -> str:
+    try:
+        opts = parse_args(argv)
+    except SystemExit:
+        return f"[!] Invalid arguments: fastports {' '.join(argv)}\n"
+
+    if opts.ports:
+        ranges = parse_port_spec(opts.ports)
+        if not ranges:
+            return f"[!] Invalid port list: {opts.ports}\n"
+        ports = sorted({p for lo, hi in ranges for p in range(lo, hi + 1)})
+    else:
+        ports = top_ports(max(1, opts.top_ports))
+
+    start = time.monotonic()
+    started = datetime.now().strftime("%Y-%m-%d %H:%M")
+    try:
+        scans = run_coro(asyncio.wait_for(
+            scan_hosts(opts.hosts, ports, max(1, opts.concurrency), max(0.05, opts.timeout), max(0, opts.retries)),
+            timeout,
+        ))
+    except asyncio.TimeoutError:
+        return f"[!] Timed out after {timeout}s: fastports {' '.join(argv)}\n"
+    elapsed = time.monotonic() - start
+
+    lines = [f"Starting fastports (in-process TCP connect scan, {len(ports)} ports) at {started}"]
+    for scan in scans:
+        lines += format_host(scan)
+        lines.append("")
+
+    up = sum(1 for s in scans if not s["error"])
+    noun = "IP address" if len(scans) == 1 else "IP addresses"
+    hosts_up = "host" if up == 1 else "hosts"
+    lines.append(f"Nmap done: {len(scans)} {noun} ({up} {hosts_up} up) scanned in {elapsed:.2f} seconds")
+    return "\n".join(lines) + "\n"
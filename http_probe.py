@@ -0,0 +1,296 @@
+from urllib.parse import urlsplit, urljoin, urlencode
+import http.client
+import random
+import re
+import ssl
+import string
+import threading
+
+import tracing
+
+REQUEST_TIMEOUT = 10
+MAX_REDIRECTS = 5
+MAX_BODY_BYTES = 512 * 1024
+USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) SaberRecon"
+
+# The same attack strings wafw00f sends in its "central" attack request.
+ATTACK_PARAMS = {
+    "a": '<script>alert("XSS");</script>',
+    "b": "UNION SELECT ALL FROM information_schema AND ' or SLEEP(5) or '",
+    "c": "../../../../etc/passwd",
+}
+
+# (technology, where to look, pattern). A version is taken from the first
+# capture group when the pattern has one.
+FINGERPRINTS = [
+    ("Apache", "header:server", r"apache(?:/([\d.]+))?"),
+    ("nginx", "header:server", r"nginx(?:/([\d.]+))?"),
+    ("Microsoft-IIS", "header:server", r"microsoft-iis(?:/([\d.]+))?"),
+    ("LiteSpeed", "header:server", r"litespeed"),
+    ("Caddy", "header:server", r"caddy"),
+    ("Cloudflare", "header:server", r"cloudflare"),
+    ("Apache-Coyote", "header:server", r"apache-coyote(?:/([\d.]+))?"),
+    ("PHP", "header:x-powered-by", r"php(?:/([\d.]+))?"),
+    ("ASP_NET", "header:x-powered-by", r"asp\.net"),
+    ("ASP_NET", "header:x-aspnet-version", r"([\d.]+)"),
+    ("Express", "header:x-powered-by", r"express"),
+    ("Next.js", "header:x-powered-by", r"next\.js"),
+    ("Servlet", "header:x-powered-by", r"servlet(?:/([\d.]+))?"),
+    ("Drupal", "header:x-generator", r"drupal(?: ([\d.]+))?"),
+    ("Drupal", "header:x-drupal-cache", r".+"),
+    ("PHP", "cookie", r"PHPSESSID"),
+    ("Java", "cookie", r"JSESSIONID"),
+    ("ASP_NET", "cookie", r"ASP\.NET_SessionId"),
+    ("Laravel", "cookie", r"laravel_session"),
+    ("Django", "cookie", r"csrftoken"),
+    ("WordPress", "body", r'<meta name="generator" content="WordPress ?([\d.]*)'),
+    ("WordPress", "body", r"/wp-content/|/wp-includes/"),
+    ("Joomla", "body", r'<meta name="generator" content="Joomla!? ?([\d.]*)'),
+    ("Drupal", "body", r'<meta name="generator" content="Drupal ?([\d.]*)'),
+    ("Shopify", "body", r"cdn\.shopify\.com"),
+    ("Wix", "body", r"static\.wixstatic\.com"),
+    ("jQuery", "body", r"jquery(?:[.-]([\d.]+))?(?:\.min)?\.js"),
+    ("Bootstrap", "body", r"bootstrap(?:[.-]([\d.]+))?(?:\.min)?\.(?:js|css)"),
+    ("React", "body", r"data-reactroot|react(?:\.production)?\.min\.js"),
+    ("Spring", "body", r"Whitelabel Error Page"),
+]
+
+
+class Headers:
+    def __init__(self, items):
+        self.raw = list(items)
+        self._map = {}
+        for k, v in self.raw:
+            key = k.lower()
+            self._map[key] = f"{self._map[key]}, {v}" if key in self._map else v
+
+    def get(self, name, default=None):
+        return self._map.get(name.lower(), default)
+
+    def __contains__(self, name):
+        return name.lower() in self._map
+
+
+# Shaped like a `requests` response, which is what wafw00f's matchers expect.
+class Response:
+    def __init__(self, url, version, status_code, reason, headers, body):
+        self.url = url
+        self.version = version
+        self.status_code = status_code
+        self.reason = reason
+        self.headers = headers
+        self.content = body
+        self.text = body.decode("utf-8", errors="replace")
+
+
+class ConnectionPool:
+    def __init__(self, timeout=REQUEST_TIMEOUT):
+        self.timeout = timeout
+        self.requests = 0
+        self._conns = {}
+        self._lock = threading.Lock()
+        self._ssl = ssl.create_default_context()
+        self._ssl.check_hostname = False
+        self._ssl.verify_mode = ssl.CERT_NONE
+
+    def _conn(self, scheme, netloc):
+        key = (scheme, netloc)
+        conn = self._conns.get(key)
+        if conn is None:
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(netloc, timeout=self.timeout, context=self._ssl)
+            else:
+                conn = http.client.HTTPConnection(netloc, timeout=self.timeout)
+            self._conns[key] = conn
+        return conn
+
+    def request(self, url, headers=None) -> Response:
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        hdrs = {"User-Agent": USER_AGENT, "Accept": "*/*", "Connection": "keep-alive"}
+        hdrs.update(headers or {})
+
+        with self._lock:
+            for attempt in (0, 1):
+                conn = self._conn(parts.scheme, parts.netloc)
+                try:
+                    conn.request("GET", path, headers=hdrs)
+                    resp = conn.getresponse()
+                    body = resp.read(MAX_BODY_BYTES)
+                    if not resp.isclosed():
+                        # Body was larger than we read; don't reuse the connection mid-body.
+                        conn.close()
+                        self._conns.pop((parts.scheme, parts.netloc), None)
+                    break
+                except (http.client.HTTPException, ConnectionError):
+                    conn.close()
+                    self._conns.pop((parts.scheme, parts.netloc), None)
+                    if attempt:
+                        raise
+            self.requests += 1
+
+        version = "HTTP/1.1" if resp.version == 11 else "HTTP/1.0"
+        return Response(url, version, resp.status, resp.reason, Headers(resp.getheaders()), body)
+
+    def get(self, url, follow=True):
+        chain = [self.request(url)]
+        while follow and len(chain) <= MAX_REDIRECTS and chain[-1].status_code in (301, 302, 303, 307, 308):
+            location = chain[-1].headers.get("location")
+            if not location:
+                break
+            chain.append(self.request(urljoin(chain[-1].url, location)))
+        return chain
+
+    def close(self):
+        with self._lock:
+            for conn in self._conns.values():
+                conn.close()
+            self._conns.clear()
+
+
+def random_path(k=16) -> str:
+    return "".join(random.choices(string.ascii_lowercase + string.digits, k=k))
+
+
+def format_headers(chain) -> str:
+    blocks = []
+    for r in chain:
+        lines = [f"{r.version} {r.status_code} {r.reason}"]
+        lines += [f"{k}: {v}" for k, v in r.headers.raw]
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks) + "\n"
+
+
+def page_title(resp) -> str | None:
+    m = re.search(r"<title[^>]*>(.*?)</title>", resp.text, re.I | re.S)
+    return " ".join(m.group(1).split())[:120] if m else None
+
+
+def fingerprint(resp) -> list[tuple[str, str]]:
+    found = {}
+    for tech, where, pattern in FINGERPRINTS:
+        if where == "body":
+            text = resp.text
+        elif where == "cookie":
+            text = resp.headers.get("set-cookie") or ""
+        else:
+            text = resp.headers.get(where.split(":", 1)[1]) or ""
+        m = re.search(pattern, text, re.I)
+        if not m:
+            continue
+        version = m.group(1) if m.groups() and m.group(1) else ""
+        if tech not in found or (version and not found[tech]):
+            found[tech] = version
+    return list(found.items())
+
+
+def format_fingerprint(chain) -> str:
+    lines = []
+    for r in chain:
+        items = [f"{r.status_code} {r.reason}"]
+        server = r.headers.get("server")
+        if server:
+            items.append(f"HTTPServer[{server}]")
+        if r is chain[-1]:
+            items += [f"{tech}[{version}]" if version else tech for tech, version in fingerprint(r)]
+            title = page_title(r)
+            if title:
+                items.append(f"Title[{title}]")
+        if r.headers.get("location"):
+            items.append(f"RedirectLocation[{r.headers.get('location')}]")
+        lines.append(f"{r.url} [{items[0]}] " + ", ".join(items[1:]))
+    return "\n".join(lines) + "\n"
+
+
+def detect_waf(normal, attack) -> tuple[list[str], str | None]:
+    try:
+        from wafw00f.main import WAFW00F
+    except ImportError:
+        return [], "wafw00f Python package not installed; vendor signatures unavailable."
+
+    # Borrow wafw00f's signature plugins and matchers, but feed them the
+    # responses we already have instead of letting it make its own requests.
+    engine = WAFW00F.__new__(WAFW00F)
+    engine.rq = normal
+    engine.attackres = attack
+    detected = []
+    for vendor in WAFW00F.checklist:
+        try:
+            if WAFW00F.wafdetections[vendor](engine):
+                detected.append(vendor)
+                break
+        except Exception:
+            continue
+
+    if detected:
+        return detected, None
+    if attack is None:
+        return [], "Blocking is being done at connection/packet level."
+    if attack.status_code != normal.status_code:
+        return [], (
+            "The server returns a different response code when an attack string is used.\n"
+            f'Normal response code is "{normal.status_code}", while the response code to an attack is "{attack.status_code}"'
+        )
+    if (attack.headers.get("server") or "") != (normal.headers.get("server") or ""):
+        return [], "The server header is different when an attack is detected."
+    return [], None
+
+
+def format_waf(url, detected, generic, requests) -> str:
+    lines = [f"[*] Checking {url}"]
+    if detected:
+        lines.append(f"[+] The site {url} is behind {' and/or '.join(detected)} WAF.")
+    elif generic:
+        lines.append("[*] Generic Detection results:")
+        lines.append(f"[*] The site {url} seems to be behind a WAF or some sort of security solution")
+        lines.append(f"[~] Reason: {generic}")
+    else:
+        lines.append("[-] No WAF detected by the generic detection")
+    lines.append(f"[~] Number of requests: {requests}")
+    return "\n".join(lines) + "\n"
+
+
+# One pooled set of requests against the target feeds the headers section,
+# the technology fingerprint, WAF detection and gobuster's wildcard probe.
+def analyze(url: str, timeout=REQUEST_TIMEOUT) -> dict:
+    pool = ConnectionPool(timeout=timeout)
+    try:
+        try:
+            with tracing.span("http.get", url=url):
+                chain = pool.get(url)
+        except (OSError, http.client.HTTPException) as e:
+            reason = f"HTTP request to {url} failed ({e})"
+            return {"status": "dead", "reason": reason, "output": f"[!] {reason}\n", "data": {}}
+        final = chain[-1]
+
+        try:
+            with tracing.span("http.wildcard_probe"):
+                missing = pool.request(f"{url.rstrip('/')}/{random_path()}")
+            wildcard = {"length": len(missing.content), "status": missing.status_code}
+        except (OSError, http.client.HTTPException):
+            wildcard = {"length": None, "status": None}
+
+        try:
+            with tracing.span("http.waf_probe"):
+                attack = pool.request(f"{final.url.split('?')[0]}?{urlencode(ATTACK_PARAMS)}")
+        except (OSError, http.client.HTTPException):
+            attack = None
+
+        detected, generic = detect_waf(final, attack)
+        fp = format_fingerprint(chain)
+        return {
+            "status": "ok",
+            "output": f"{pool.requests} requests to {url}\n",
+            "data": {
+                "headers": format_headers(chain),
+                "fingerprint": fp,
+                "technologies": [tech for tech, _ in fingerprint(final)],
+                "waf": format_waf(url, detected, generic, pool.requests),
+                "wildcard": wildcard,
+                "requests": pool.requests,
+            },
+        }
+    finally:
+        pool.close()
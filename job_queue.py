@@ -0,0 +1,118 @@
+from concurrent.futures import Future
+import itertools
+import os
+import threading
+import time
+
+# Priority classes, most urgent first.
+INTERACTIVE = 0
+SCAN = 1
+BATCH = 2
+RECURRING = 3
+
+PRIORITY_NAMES = {INTERACTIVE: "interactive", SCAN: "scan", BATCH: "batch", RECURRING: "recurring"}
+
+# Interactive jobs and background work (scans, batch, recurring) have
+# separate slot budgets: at most MAX_RUNNING background jobs and
+# MAX_INTERACTIVE interactive ones run at once. A quick lookup never waits
+# behind a saturated scanner, and a slow interactive tool never holds up
+# a scan.
+MAX_RUNNING = int(os.environ.get("SABERRECON_MAX_JOBS", "2"))
+MAX_INTERACTIVE = int(os.environ.get("SABERRECON_MAX_INTERACTIVE_JOBS", "2"))
+
+# A queued job moves up one class for every AGING_SECONDS it has waited, so
+# batch and recurring work is not starved by a steady stream of scans.
+AGING_SECONDS = 120
+
+_COND = threading.Condition()
+_QUEUE = []
+_RUNNING = []
+_WORKERS = []
+_SEQ = itertools.count()
+
+
+def effective_priority(entry, now) -> float:
+    return entry["priority"] - (now - entry["enqueued"]) / AGING_SECONDS
+
+
+def _has_slot(entry) -> bool:
+    interactive = entry["priority"] == INTERACTIVE
+    running = sum((e["priority"] == INTERACTIVE) == interactive for e in _RUNNING)
+    return running < (MAX_INTERACTIVE if interactive else MAX_RUNNING)
+
+
+def _pick():
+    if not _QUEUE:
+        return None
+    candidates = [e for e in _QUEUE if _has_slot(e)]
+    if not candidates:
+        return None
+    now = time.monotonic()
+    entry = min(candidates, key=lambda e: (effective_priority(e, now), e["seq"]))
+    _QUEUE.remove(entry)
+    return entry
+
+
+def _worker():
+    while True:
+        with _COND:
+            entry = _pick()
+            while entry is None:
+                # Wake up now and then so aging is re-evaluated.
+                _COND.wait(timeout=AGING_SECONDS / 4)
+                entry = _pick()
+            _RUNNING.append(entry)
+
+        fut = entry["future"]
+        try:
+            if fut.set_running_or_notify_cancel():
+                entry["started"] = time.monotonic()
+                try:
+                    fut.set_result(entry["fn"](*entry["args"], **entry["kwargs"]))
+                except BaseException as e:
+                    fut.set_exception(e)
+        finally:
+            with _COND:
+                _RUNNING.remove(entry)
+                _COND.notify_all()
+
+
+def _ensure_workers():
+    while len(_WORKERS) < MAX_RUNNING + MAX_INTERACTIVE:
+        t = threading.Thread(target=_worker, name=f"job-worker-{len(_WORKERS)}", daemon=True)
+        t.start()
+        _WORKERS.append(t)
+
+
+def submit(fn, *args, priority=SCAN, name="", **kwargs) -> Future:
+    fut = Future()
+    entry = {
+        "fn": fn,
+        "args": args,
+        "kwargs": kwargs,
+        "priority": priority,
+        "name": name or getattr(fn, "__name__", "job"),
+        "seq": next(_SEQ),
+        "enqueued": time.monotonic(),
+        "future": fut,
+    }
+    with _COND:
+        _ensure_workers()
+        _QUEUE.append(entry)
+        _COND.notify_all()
+    return fut
+
+
+def snapshot() -> dict:
+    now = time.monotonic()
+    with _COND:
+        running = [
+            {"name": e["name"], "priority": PRIORITY_NAMES[e["priority"]], "seconds": round(now - e.get("started", now), 1)}
+            for e in _RUNNING
+        ]
+        queued = sorted(_QUEUE, key=lambda e: (effective_priority(e, now), e["seq"]))
+        queued = [
+            {"name": e["name"], "priority": PRIORITY_NAMES[e["priority"]], "waited": round(now - e["enqueued"], 1)}
+            for e in queued
+        ]
+    return {"max_running": MAX_RUNNING, "max_interactive": MAX_INTERACTIVE, "running": running, "queued": queued}
@@ -0,0 +1,245 @@
+import re
+
+MAX_PORT = 65535
+
+# Only explicit port ranges at least this wide are split, into at most
+# NMAP_MAX_SHARDS processes of at least NMAP_MIN_SHARD_PORTS ports each.
+NMAP_SHARD_MIN_PORTS = 4096
+NMAP_MIN_SHARD_PORTS = 1024
+NMAP_MAX_SHARDS = 4
+
+NMAP_BATCH_SIZE = 64
+
+# Flags that make a port split meaningless or unsafe to merge.
+NO_SHARD_FLAGS = {"-sn", "-sL", "-sO", "-iL", "-iR", "-r", "-F", "--top-ports", "--port-ratio", "-oN", "-oX", "-oG", "-oA", "-oS"}
+
+PORT_LINE_RE = re.compile(r"^(\d+)/(tcp|udp|sctp)\s+\S+")
+NOT_SHOWN_RE = re.compile(r"(\d+) ([a-z|]+ (?:(?:tcp|udp|sctp) )?port)s?( \([^)]*\))?")
+ALL_IGNORED_RE = re.compile(r"^All (\d+) scanned ports on (.+) are in ignored states\.")
+DONE_RE = re.compile(r"^Nmap done: .* scanned in ([\d.]+) seconds")
+REPORT_RE = re.compile(r"^Nmap scan report for (\S+)(?: \(([^)]+)\))?")
+
+
+def find_port_spec(args: list[str]):
+    for i, a in enumerate(args):
+        if a == "-p" and i + 1 < len(args):
+            return i, 2, args[i + 1]
+        if a.startswith("-p") and len(a) > 2 and a[2] not in "PSAUYEMO":
+            return i, 1, a[2:]
+    return None
+
+
+def parse_port_spec(spec: str):
+    if spec == "-":
+        return [(1, MAX_PORT)]
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if ":" in part or not re.fullmatch(r"\d*-?\d*", part):
+            return None
+        if "-" in part:
+            lo, hi = part.split("-", 1)
+            lo = int(lo) if lo else 1
+            hi = int(hi) if hi else MAX_PORT
+        else:
+            lo = hi = int(part)
+        if lo > hi:
+            lo, hi = hi, lo
+        ranges.append((max(lo, 1), min(hi, MAX_PORT)))
+    return ranges or None
+
+
+def format_port_spec(ranges) -> str:
+    return ",".join(str(lo) if lo == hi else f"{lo}-{hi}" for lo, hi in ranges)
+
+
+def split_ranges(ranges, shards: int) -> list[list[tuple[int, int]]]:
+    total = sum(hi - lo + 1 for lo, hi in ranges)
+    per_shard = -(-total // shards)
+
+    out = []
+    current = []
+    room = per_shard
+    for lo, hi in ranges:
+        while lo <= hi:
+            take = min(hi - lo + 1, room)
+            current.append((lo, lo + take - 1))
+            lo += take
+            room -= take
+            if room == 0:
+                out.append(current)
+                current = []
+                room = per_shard
+    if current:
+        out.append(current)
+    return out
+
+
+def plan_port_shards(args: list[str]) -> list[list[str]]:
+    if any(a in NO_SHARD_FLAGS for a in args):
+        return [args]
+    found = find_port_spec(args)
+    if not found:
+        return [args]
+    idx, width, spec = found
+    ranges = parse_port_spec(spec)
+    if not ranges:
+        return [args]
+
+    total = sum(hi - lo + 1 for lo, hi in ranges)
+    if total < NMAP_SHARD_MIN_PORTS:
+        return [args]
+    shards = min(NMAP_MAX_SHARDS, total // NMAP_MIN_SHARD_PORTS)
+    if shards < 2:
+        return [args]
+
+    plans = []
+    for chunk in split_ranges(ranges, shards):
+        plans.append(args[:idx] + ["-p", format_port_spec(chunk)] + args[idx + width:])
+    return plans
+
+
+def _parse_shard(output: str) -> dict:
+    parsed = {"header": [], "ports": [], "not_shown": {}, "ignored": 0, "ignored_host": None, "extra": [], "footer": None, "seconds": 0.0}
+    section = "header"
+    current = None
+    for line in output.splitlines():
+        done = DONE_RE.match(line)
+        if done:
+            parsed["footer"] = line
+            parsed["seconds"] = float(done.group(1))
+            section = "extra"
+            continue
+
+        ignored = ALL_IGNORED_RE.match(line)
+        if ignored:
+            parsed["ignored"] += int(ignored.group(1))
+            parsed["ignored_host"] = ignored.group(2)
+            section = "extra"
+            continue
+
+        if line.startswith("Not shown:"):
+            for count, desc, why in NOT_SHOWN_RE.findall(line):
+                key = desc + "s" + why
+                parsed["not_shown"][key] = parsed["not_shown"].get(key, 0) + int(count)
+            continue
+
+        if line.startswith("PORT ") and "STATE" in line:
+            section = "ports"
+            continue
+
+        if section == "ports":
+            m = PORT_LINE_RE.match(line)
+            if m:
+                current = [int(m.group(1)), line, []]
+                parsed["ports"].append(current)
+                continue
+            if line.startswith("|") and current is not None:
+                current[2].append(line)
+                continue
+            section = "extra"
+
+        if section == "header":
+            parsed["header"].append(line)
+        elif line.strip() and line not in parsed["extra"]:
+            parsed["extra"].append(line)
+    return parsed
+
+
+def _port_table(ports) -> list[str]:
+    rows = [line.split(None, 3) for _, line, _ in ports]
+    cols = ["PORT", "STATE", "SERVICE", "VERSION"][:max(len(r) for r in rows)]
+    widths = [max([len(cols[i])] + [len(r[i]) for r in rows if len(r) > i]) for i in range(len(cols))]
+
+    def fmt(cells):
+        return " ".join(c.ljust(widths[i]) for i, c in enumerate(cells)).rstrip()
+
+    out = [fmt(cols)]
+    for (_, _, script), row in zip(ports, rows):
+        out.append(fmt(row))
+        out.extend(script)
+    return out
+
+
+def merge_shard_outputs(outputs: list[str]) -> str:
+    parsed = [_parse_shard(o) for o in outputs]
+    if not any(p["footer"] for p in parsed):
+        return "".join(outputs)
+    failed = [o for o, p in zip(outputs, parsed) if not p["footer"]]
+    parsed = [p for p in parsed if p["footer"]]
+
+    header = next((p["header"] for p in parsed if any(l.startswith("Nmap scan report") for l in p["header"])), parsed[0]["header"])
+    lines = list(header)
+
+    not_shown = {}
+    for p in parsed:
+        for key, count in p["not_shown"].items():
+            not_shown[key] = not_shown.get(key, 0) + count
+    ignored = sum(p["ignored"] for p in parsed)
+    ports = sorted((port for p in parsed for port in p["ports"]), key=lambda port: port[0])
+
+    if ports:
+        if not_shown:
+            lines.append("Not shown: " + ", ".join(f"{count} {key}" for key, count in not_shown.items()))
+        lines += _port_table(ports)
+    else:
+        total = ignored or sum(not_shown.values())
+        host = next((p["ignored_host"] for p in parsed if p["ignored_host"]), "target")
+        lines.append(f"All {total} scanned ports on {host} are in ignored states.")
+        if not_shown:
+            lines.append("Not shown: " + ", ".join(f"{count} {key}" for key, count in not_shown.items()))
+
+    extra = []
+    for p in parsed:
+        extra += [l for l in p["extra"] if l not in extra]
+    lines += extra
+
+    seconds = max(p["seconds"] for p in parsed)
+    footer = next(p["footer"] for p in parsed if p["footer"])
+    lines.append("")
+    lines.append(re.sub(r"scanned in [\d.]+ seconds", f"scanned in {seconds:.2f} seconds", footer))
+    return "".join(failed) + "\n".join(lines) + "\n"
+
+
+def plan_host_batches(hosts: list[str], batch_size: int = NMAP_BATCH_SIZE) -> list[list[str]]:
+    unique = list(dict.fromkeys(h for h in hosts if h))
+    return [unique[i:i + batch_size] for i in range(0, len(unique), batch_size)]
+
+
+def split_output_by_host(output: str, hosts: list[str]) -> dict:
+    preamble = []
+    blocks = {}
+    current = None
+    footer = None
+    for line in output.splitlines():
+        m = REPORT_RE.match(line)
+        if m:
+            names = {m.group(1), m.group(2)} - {None}
+            current = next((h for h in hosts if h in names), m.group(1))
+            blocks[current] = [line]
+            continue
+        if DONE_RE.match(line):
+            footer = line
+            current = None
+            continue
+        if current is None:
+            if line.strip():
+                preamble.append(line)
+        else:
+            blocks[current].append(line)
+
+    seconds = DONE_RE.match(footer).group(1) if footer else "0"
+    out = {}
+    for h in hosts:
+        body = blocks.get(h)
+        if body is None:
+            body = ["Note: Host seems down. If it is really up, but blocking our ping probes, try -Pn"]
+            done = f"Nmap done: 1 IP address (0 hosts up) scanned in {seconds} seconds"
+        else:
+            while body and not body[-1].strip():
+                body.pop()
+            done = f"Nmap done: 1 IP address (1 host up) scanned in {seconds} seconds"
+        out[h] = "\n".join(preamble[:1] + body + ["", done]) + "\n"
+    return out
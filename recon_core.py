@@ -1,18 +1,42 @@
 from datetime import datetime
 from urllib.parse import urlparse
-from jinja2 import Environment, FileSystemLoader, select_autoescape
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeout
+from functools import lru_cache
+from collections import deque
 import subprocess
-import random
-import string
+import resource
+import signal
+import shutil
+import re
+import threading
+import socket
+import sqlite3
+import time
 import base64
 import mimetypes
+import tempfile
+import zlib
+import contextvars
+import os
+
+import blob_store
+import checkpoints
+import fastports
+import http_probe
+import nmap_planner
+import search_index
+import timings
+import tracing
+import whois_client
+import wordlists
 
 TOOL_DEFS = {
     "whois": {
         "title": "WHOIS Lookup",
         "kind": "domain",
         "base": ["whois"],
+        "limits": {"as_mb": 256, "cpu": 30, "nofile": 64, "nice": 5},
         "groups": [
             {
                 "name": "Common flags",
@@ -55,10 +79,26 @@ TOOL_DEFS = {
             },
         ],
     },
+    "whois_native": {
+        "title": "WHOIS (built-in client)",
+        "kind": "domain",
+        "base": ["saber-whois"],
+        "groups": [
+            {
+                "name": "Lookup",
+                "options": [
+                    {"flag": "-h", "type": "str", "label": "Query this server instead of the TLD's (-h <host>)", "default": ""},
+                    {"flag": "--no-referral", "type": "bool", "label": "Do not follow registrar referrals (--no-referral)", "default": False},
+                    {"flag": "--rdap", "type": "bool", "label": "Use RDAP instead of port 43 WHOIS (--rdap)", "default": False},
+                ],
+            },
+        ],
+    },
     "nslookup": {
         "title": "NSLookup",
         "kind": "domain",
         "base": ["nslookup"],
+        "limits": {"as_mb": 256, "cpu": 30, "nofile": 64, "nice": 5},
         "groups": [
             {
                 "name": "Query basics",
@@ -111,6 +151,7 @@ TOOL_DEFS = {
         "title": "DIG (DNS Lookup)",
         "kind": "domain",
         "base": ["dig"],
+        "limits": {"as_mb": 256, "cpu": 30, "nofile": 64, "nice": 5},
         "groups": [
 
             {
@@ -221,6 +262,7 @@ TOOL_DEFS = {
         "title": "Nmap",
         "kind": "domain",
         "base": ["nmap"],
+        "limits": {"as_mb": 1024, "cpu": 600, "nofile": 4096, "nice": 10, "ionice": 7},
         "groups": [
             {
                 "name": "Target Specification",
@@ -332,10 +374,33 @@ TOOL_DEFS = {
             },
         ],
     },
+    "fastports": {
+        "title": "Fast Ports (built-in TCP connect scan)",
+        "kind": "domain",
+        "base": ["fastports"],
+        "groups": [
+            {
+                "name": "Ports",
+                "options": [
+                    {"flag": "--top-ports", "type": "int", "label": "Top ports (--top-ports <n>)", "default": 100, "min": 1, "max": 65535},
+                    {"flag": "-p", "type": "str", "label": "Ports (-p <ranges>, overrides top ports)", "default": ""},
+                ],
+            },
+            {
+                "name": "Performance",
+                "options": [
+                    {"flag": "--concurrency", "type": "int", "label": "Concurrent connects (--concurrency <n>)", "default": 500, "min": 1, "max": 5000},
+                    {"flag": "--timeout", "type": "str", "label": "Per-connect timeout in seconds (--timeout <s>)", "default": "1.0"},
+                    {"flag": "--retries", "type": "int", "label": "Retries for unanswered ports (--retries <n>)", "default": 0, "min": 0, "max": 5},
+                ],
+            },
+        ],
+    },
     "curl": {
         "title": "curl (HTTP Request)",
         "kind": "url",
         "base": ["curl"],
+        "limits": {"as_mb": 512, "cpu": 60, "nofile": 256, "nice": 5},
         "groups": [
     
             {
@@ -421,6 +486,7 @@ TOOL_DEFS = {
         "title": "WhatWeb Fingerprint",
         "kind": "url",
         "base": ["whatweb"],
+        "limits": {"as_mb": 1024, "cpu": 120, "nofile": 512, "nice": 10},
         "groups": [
             {
                 "name": "Aggression",
@@ -522,6 +588,7 @@ TOOL_DEFS = {
         "title": "subfinder",
         "kind": "domain",
         "base": ["subfinder"],
+        "limits": {"as_mb": 4096, "cpu": 300, "nofile": 2048, "nice": 10, "out_lines": 10000},
         "groups": [
             {
                 "name": "Targets",
@@ -607,6 +674,7 @@ TOOL_DEFS = {
         "title": "WAF Detection (WAFW00F)",
         "kind": "url",
         "base": ["wafw00f"],
+        "limits": {"as_mb": 1024, "cpu": 120, "nofile": 256, "nice": 10},
         "groups": [
             {
                 "name": "Basics",
@@ -803,6 +871,10 @@ def build_tool_command(tool_id: str, domain: str, url: str, selected: dict) -> l
     
 
 def run_single_tool(target: str, tool_id: str, selected: dict) -> dict:
+    hosts = [normalize_target(t) for t in re.split(r"[\s,]+", target or "") if t.strip()]
+    if tool_id == "nmap" and len(hosts) > 1:
+        return run_nmap_batch_tool(target, hosts, selected)
+
     domain = normalize_target(target)
     if not domain:
         raise ValueError("Target is empty or invalid.")
@@ -812,19 +884,88 @@ def run_single_tool(target: str, tool_id: str, selected: dict) -> dict:
     
 
     cmd = build_tool_command(tool_id, domain=domain, url=url, selected=selected)
+    if tool_id in ("fastports", "whois_native") and len(hosts) > 1:
+        cmd = cmd[:-1] + list(dict.fromkeys(hosts))
+        domain = ", ".join(dict.fromkeys(hosts))
     title = TOOL_DEFS[tool_id]["title"]
-    output = run_cmd(cmd, timeout=90)
+    if tool_id == "nmap":
+        output = run_nmap(cmd, timeout=90)
+    else:
+        output = run_cmd(cmd, timeout=90)
 
     if title.startswith("Subdomain Enumeration") and not output.strip():
         output = "No subdomains found.\n"
 
+    section = {"title": title, "command": " ".join(cmd), "output": output}
     return {
         "target": target,
         "domain": domain,
-        "section": {"title": title, "command": " ".join(cmd), "output": output},
+        "section": section,
+        "sections": [section],
     }
 
 
+# The host list is passed to nmap with -iL, so the Tools page can't also
+# supply its own target list.
+BATCH_TARGET_FLAGS = ("-iL", "-iR")
+
+
+def run_nmap_batch_tool(target: str, hosts: list[str], selected: dict) -> dict:
+    hosts = list(dict.fromkeys(h for h in hosts if h))
+    if not hosts:
+        raise ValueError("Target is empty or invalid.")
+    cmd = build_tool_command("nmap", domain=hosts[0], url=f"https://{hosts[0]}", selected=selected)[:-1]
+    for flag in BATCH_TARGET_FLAGS:
+        if flag in cmd:
+            raise ValueError(f"{flag} can't be combined with multiple targets; list the hosts in the target field or use {flag} with a single target.")
+    title = TOOL_DEFS["nmap"]["title"]
+    outputs = run_nmap_hosts(cmd, hosts, timeout=90)
+
+    sections = [
+        {"title": f"{title} ({host})", "command": " ".join(cmd + [host]), "output": outputs[host]}
+        for host in hosts
+    ]
+    return {
+        "target": target,
+        "domain": ", ".join(hosts),
+        "section": sections[0],
+        "sections": sections,
+    }
+
+
+# Wide explicit port ranges are split across parallel nmap processes and
+# merged back into one normal-format report.
+def run_nmap(args, timeout=90) -> str:
+    plans = nmap_planner.plan_port_shards(args)
+    if len(plans) == 1:
+        return run_cmd(args, timeout=timeout)
+    with ThreadPoolExecutor(max_workers=len(plans)) as pool:
+        outputs = list(pool.map(lambda shard: run_cmd(shard, timeout=timeout), plans))
+    return nmap_planner.merge_shard_outputs(outputs)
+
+
+# Many hosts are scanned by a few `nmap -iL` processes instead of one per
+# host; the combined output is split back out per host.
+def run_nmap_hosts(args, hosts: list[str], timeout=90) -> dict:
+    def run_batch(batch):
+        with tempfile.NamedTemporaryFile("w", prefix="nmap-hosts-", suffix=".txt", delete=False) as f:
+            f.write("\n".join(batch) + "\n")
+        try:
+            output = run_cmd(list(args) + ["-iL", f.name], timeout=timeout)
+        finally:
+            os.unlink(f.name)
+        if "Nmap done:" not in output:
+            return {h: output for h in batch}
+        return nmap_planner.split_output_by_host(output, batch)
+
+    batches = nmap_planner.plan_host_batches(hosts)
+    results = {}
+    with ThreadPoolExecutor(max_workers=min(len(batches), nmap_planner.NMAP_MAX_SHARDS) or 1) as pool:
+        for out in pool.map(run_batch, batches):
+            results.update(out)
+    return results
+
+
 def build_data_uri_for_logo(logo_path: Path) -> str | None: 
   try: 
     data = logo_path.read_bytes() 
@@ -838,25 +979,6 @@ def build_data_uri_for_logo(logo_path: Path) -> str | None:
   b64 = base64.b64encode(data).decode("ascii") 
   return f"data:{mime};base64,{b64}"
 
-def detect_wildcard_length(domain: str) -> int | None:
-    fake_path = ''.join(random.choices(string.ascii_lowercase + string.digits, k=16))
-    url = f"https://{domain}/{fake_path}"
-    out = run_cmd(["curl", "-s", "-o", "/dev/null", "-w", "%{size_download}", url], timeout=20).strip()
-    try:
-        return int(out)
-    except:
-        return None
-
-def detect_wildcard_status(domain: str) -> int | None:
-    fake_path = ''.join(random.choices(string.ascii_lowercase + string.digits, k=16))
-    url = f"https://{domain}/{fake_path}"
-    out = run_cmd(["curl", "-s", "-o", "/dev/null", "-w", "%{http_code}", url], timeout=20).strip()
-    try:
-        return int(out)
-    except:
-        return None
-
-
 def normalize_target(target: str) -> str:
     t = (target or "").strip()
     if not t:
@@ -868,25 +990,412 @@ def normalize_target(target: str) -> str:
     return domain.strip().strip("/")
 
 
+# Identical invocations (same argv + timeout) that overlap in time share a
+# single child process: the first caller runs it, later callers wait on it.
+INFLIGHT = {}
+INFLIGHT_LOCK = threading.Lock()
+
+
 def run_cmd(args, timeout=90) -> str:
+    with tracing.span(f"run_cmd {args[0]}", argv=" ".join(args), timeout=timeout) as attrs:
+        output = _run_cmd_shared(args, timeout, attrs)
+        attrs["output_bytes"] = len(output)
+        return output
+
+
+def _run_cmd_shared(args, timeout, attrs) -> str:
+    key = (tuple(args), timeout)
+
+    with INFLIGHT_LOCK:
+        flight = INFLIGHT.get(key)
+        leader = flight is None
+        if leader:
+            flight = {"done": threading.Event(), "output": None, "error": None}
+            INFLIGHT[key] = flight
+
+    if not leader:
+        attrs["shared"] = True
+        flight["done"].wait()
+        if flight["error"] is not None:
+            raise flight["error"]
+        return flight["output"]
+
     try:
-        out = subprocess.check_output(args, stderr=subprocess.STDOUT, timeout=timeout)
-        return out.decode(errors="replace")
+        flight["output"] = _exec_cmd(args, timeout)
+    except Exception as e:
+        flight["error"] = e
+        raise
+    finally:
+        with INFLIGHT_LOCK:
+            INFLIGHT.pop(key, None)
+        flight["done"].set()
+
+    return flight["output"]
+
+
+# Tool binaries are looked up once with shutil.which and remembered, so a
+# missing tool is reported without spawning anything.
+TOOL_PATHS = {}
+TOOL_PATHS_LOCK = threading.Lock()
+
+
+def tool_path(name: str) -> str | None:
+    with TOOL_PATHS_LOCK:
+        if name in TOOL_PATHS:
+            return TOOL_PATHS[name]
+    path = shutil.which(name)
+    with TOOL_PATHS_LOCK:
+        TOOL_PATHS[name] = path
+    return path
+
+
+# Tools implemented in Python; their argv is handled in-process instead of
+# spawning a binary.
+NATIVE_TOOLS = {
+    "fastports": fastports.main,
+    "saber-whois": whois_client.main,
+}
+
+
+# Every spawned tool runs in its own process group with these limits; a
+# TOOL_DEFS entry overrides them through its "limits" dict. as_mb caps the
+# address space, cpu is CPU seconds, nofile is open descriptors, and ionice
+# is the best-effort I/O priority level (0-7). out_kb and out_lines cap how
+# much output is kept in memory and rendered; the rest spills to OUTPUT_DIR.
+DEFAULT_TOOL_LIMITS = {"as_mb": 1024, "cpu": 300, "nofile": 1024, "nice": 10, "ionice": 7, "out_kb": 1024, "out_lines": 20000}
+
+TOOL_LIMITS = {tool["base"][0]: {**DEFAULT_TOOL_LIMITS, **tool.get("limits", {})} for tool in TOOL_DEFS.values()}
+TOOL_LIMITS["gobuster"] = {**DEFAULT_TOOL_LIMITS, "as_mb": 4096, "cpu": 600, "nofile": 1024, "out_kb": 512, "out_lines": 5000}
+
+LIMIT_PATTERNS = [
+    ("as_mb", re.compile(r"cannot allocate memory|out of memory|memoryerror|bad_alloc|failed to reserve", re.I)),
+    ("nofile", re.compile(r"too many open files", re.I)),
+    ("cpu", re.compile(r"cpu time limit exceeded|sigxcpu", re.I)),
+]
+LIMIT_NAMES = {"as_mb": "address space ({} MB)", "nofile": "open files ({})", "cpu": "CPU time ({}s)"}
+
+
+def _rlimit(res, soft, hard=None) -> tuple[int, int]:
+    hard = soft if hard is None else hard
+    _, cur_hard = resource.getrlimit(res)
+    if cur_hard != resource.RLIM_INFINITY:
+        soft, hard = min(soft, cur_hard), min(hard, cur_hard)
+    return soft, hard
+
+
+# (resource, prlimit option, soft, hard) for a tool's limits. The CPU soft
+# limit sends SIGXCPU; the hard limit is a SIGKILL shortly after.
+def _rlimits(limits) -> list[tuple]:
+    return [
+        (resource.RLIMIT_AS, "as", *_rlimit(resource.RLIMIT_AS, limits["as_mb"] * 1024 * 1024)),
+        (resource.RLIMIT_CPU, "cpu", *_rlimit(resource.RLIMIT_CPU, limits["cpu"], limits["cpu"] + 5)),
+        (resource.RLIMIT_NOFILE, "nofile", *_rlimit(resource.RLIMIT_NOFILE, limits["nofile"])),
+    ]
+
+
+# preexec_fn can deadlock a forked child in a threaded process, so limits
+# are applied by the argv instead: prlimit sets the rlimits, then nice and
+# ionice exec the tool at lower priority, all in the same process.
+def _limit_prefix(limits) -> list[str]:
+    prefix = []
+    if tool_path("prlimit"):
+        prefix += ["prlimit"] + [f"--{name}={soft}:{hard}" for _, name, soft, hard in _rlimits(limits)]
+    if limits.get("nice") and tool_path("nice"):
+        prefix += ["nice", "-n", str(limits["nice"])]
+    if limits.get("ionice") is not None and tool_path("ionice"):
+        prefix += ["ionice", "-c", "2", "-n", str(limits["ionice"])]
+    return prefix
+
+
+# Without the prlimit binary the limits are set on the child right after it
+# starts instead.
+def _limit_started(proc, limits) -> None:
+    if tool_path("prlimit"):
+        return
+    for res, _, soft, hard in _rlimits(limits):
+        try:
+            resource.prlimit(proc.pid, res, (soft, hard))
+        except (OSError, ValueError):
+            pass
+
+
+# Only called while the child is still unreaped, so its pid is still the
+# group id and can't have been reused.
+def _kill_group(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+OUTPUT_DIR = Path("/data") / ".output"
+SPILL_RE = re.compile(r"Full output: /output/([A-Za-z0-9_.-]+\.log)")
+
+
+def output_dir() -> Path:
+    try:
+        OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+        return OUTPUT_DIR
+    except OSError:
+        fallback = Path(tempfile.gettempdir()) / "saberrecon-output"
+        fallback.mkdir(parents=True, exist_ok=True)
+        return fallback
+
+
+# Output is buffered whole until a run goes over its byte or line cap. From
+# then on everything (including what was already buffered) is streamed to a
+# spill file, and only a head and a tail are kept: the head is the first half
+# of the byte budget, and the tail holds the last out_lines / 2 complete
+# lines within the other half. The tail is filled however much the head
+# holds, so a run cut by its line cap still shows both ends.
+class OutputCapture:
+    def __init__(self, tool: str, limits: dict):
+        self.tool = re.sub(r"[^A-Za-z0-9_.-]", "_", Path(tool).name)
+        self.max_bytes = limits["out_kb"] * 1024
+        self.max_lines = limits["out_lines"]
+        self.buf = bytearray()
+        self.head = b""
+        self.tail = deque()
+        self.tail_bytes = 0
+        self.partial = b""
+        self.total = 0
+        self.lines = 0
+        self.truncated = False
+        self.spill = None
+        self.spill_path = None
+
+    def write(self, data: bytes):
+        self.total += len(data)
+        self.lines += data.count(b"\n")
+
+        if self.truncated:
+            if self.spill:
+                self.spill.write(data)
+            self._add_tail(data)
+            return
+
+        self.buf += data
+        if self.total > self.max_bytes or self.lines > self.max_lines:
+            self.truncated = True
+            data = bytes(self.buf)
+            self.buf = bytearray()
+            self.head = data[:self.max_bytes // 2]
+            self._start_spill(data)
+            self._add_tail(data)
+
+    def _add_tail(self, data: bytes):
+        half = self.max_bytes // 2
+        # One very long line can't grow the tail past its byte budget.
+        pending = (self.partial + data)[-half:] if half else b""
+        *lines, self.partial = pending.split(b"\n")
+        for line in lines:
+            self.tail.append(line + b"\n")
+            self.tail_bytes += len(line) + 1
+        keep = self.max_lines // 2
+        while self.tail and (len(self.tail) > keep or self.tail_bytes + len(self.partial) > half):
+            self.tail_bytes -= len(self.tail.popleft())
+
+    def _start_spill(self, data: bytes):
+        name = f"{self.tool}-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}.log"
+        try:
+            path = output_dir() / name
+            self.spill = open(path, "wb")
+            self.spill.write(data)
+            self.spill_path = path
+        except OSError:
+            self.spill = None
+
+    def close(self):
+        if self.spill:
+            self.spill.close()
+            self.spill = None
+
+    def text(self) -> str:
+        if not self.truncated:
+            return bytes(self.buf).decode(errors="replace")
+
+        half_lines = self.max_lines // 2
+        head_lines = self.head.decode(errors="replace").splitlines(keepends=True)[:half_lines]
+        tail_lines = [line.decode(errors="replace") for line in self.tail]
+        if self.partial:
+            tail_lines.append(self.partial.decode(errors="replace"))
+        tail_lines = tail_lines[-half_lines:] if half_lines else []
+
+        where = f"Full output: /output/{self.spill_path.name}" if self.spill_path else "Full output could not be saved."
+        marker = (
+            f"\n[!] Output truncated: {self.total} bytes / {self.lines} lines total, "
+            f"showing the first {len(head_lines)} and last {len(tail_lines)} lines. {where}\n\n"
+        )
+        return "".join(head_lines) + marker + "".join(tail_lines)
+
+
+def capture_text(tool: str, text: str) -> str:
+    capture = OutputCapture(tool, TOOL_LIMITS.get(tool, DEFAULT_TOOL_LIMITS))
+    capture.write(text.encode("utf-8", errors="replace"))
+    capture.close()
+    return capture.text()
+
+
+def _pump(stream, capture):
+    for chunk in iter(lambda: stream.read1(65536), b""):
+        capture.write(chunk)
+
+
+def limit_hits(returncode, output, limits) -> list[str]:
+    hit = {key for key, pattern in LIMIT_PATTERNS if pattern.search(output)}
+    if returncode in (-signal.SIGXCPU, -signal.SIGKILL):
+        hit.add("cpu")
+    return [LIMIT_NAMES[key].format(limits[key]) for key, _ in LIMIT_PATTERNS if key in hit]
+
+
+def discover_tools() -> dict:
+    names = ({tool["base"][0] for tool in TOOL_DEFS.values()} | {"gobuster"}) - set(NATIVE_TOOLS)
+    return {name: tool_path(name) for name in sorted(names)}
+
+
+def _exec_cmd(args, timeout=90) -> str:
+    if args[0] in NATIVE_TOOLS:
+        try:
+            return capture_text(args[0], NATIVE_TOOLS[args[0]](list(args[1:]), timeout=timeout))
+        except Exception as e:
+            return f"[!] Error running: {' '.join(args)}\n{e}\n"
+    if tool_path(args[0]) is None:
+        return f"[!] Tool not installed: {args[0]}\n"
+
+    limits = TOOL_LIMITS.get(args[0], DEFAULT_TOOL_LIMITS)
+    argv = _limit_prefix(limits) + list(args)
+    try:
+        with tracing.span(f"spawn {args[0]}"):
+            proc = subprocess.Popen(
+                argv,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                start_new_session=True,
+            )
     except FileNotFoundError:
         return f"[!] Tool not installed: {args[0]}\n"
+    _limit_started(proc, limits)
+
+    capture = OutputCapture(args[0], limits)
+    reader = threading.Thread(target=_pump, args=(proc.stdout, capture), daemon=True)
+    reader.start()
+    try:
+        proc.wait(timeout=timeout)
     except subprocess.TimeoutExpired:
-        return f"[!] Timed out after {timeout}s: {' '.join(args)}\n"
-    except subprocess.CalledProcessError as e:
-        return f"[!] Error running: {' '.join(args)}\n{e.output.decode(errors='replace')}\n"
+        # Kill the whole group so helpers the tool forked don't outlive it.
+        _kill_group(proc)
+        proc.wait()
+        reader.join()
+        capture.close()
+        return f"[!] Timed out after {timeout}s: {' '.join(args)} (process group killed)\n{capture.text()}"
+    except BaseException:
+        _kill_group(proc)
+        proc.wait()
+        raise
 
+    reader.join()
+    proc.stdout.close()
+    capture.close()
+    output = capture.text()
+    notes = "".join(f"[!] Resource limit hit: {hit}\n" for hit in limit_hits(proc.returncode, output, limits))
+    if proc.returncode != 0:
+        return f"{notes}[!] Error running: {' '.join(args)}\n{output}\n"
+    return notes + output
+
+
+PREFLIGHT_DNS_TIMEOUT = 5.0
+PREFLIGHT_CONNECT_TIMEOUT = 2.0
+PREFLIGHT_WEB_PORTS = (443, 80)
+
+_RESOLVER = ThreadPoolExecutor(max_workers=4)
 
-def build_tools(domain: str):
-    url = f"https://{domain}"
 
-    wild_len = detect_wildcard_length(domain)
-    wild_code = detect_wildcard_status(domain)
+def invalid_host(domain: str, e: Exception, key: str) -> dict:
+    reason = f"Invalid host {domain!r} ({e})"
+    return {"status": "dead", "reason": reason, "output": f"[!] {reason}\n", "data": {key: []}}
 
-    gobuster_args = ["gobuster", "dir", "-u", url, "-w", "./common.txt", "-f"]
+
+def resolve_host(domain: str) -> dict:
+    try:
+        host = urlparse("//" + domain).hostname or domain
+    except ValueError as e:
+        return invalid_host(domain, e, "addresses")
+    # getaddrinfo has no timeout of its own, so bound it from the outside.
+    fut = _RESOLVER.submit(socket.getaddrinfo, host, None, proto=socket.IPPROTO_TCP)
+    try:
+        infos = fut.result(timeout=PREFLIGHT_DNS_TIMEOUT)
+    # UnicodeError (a ValueError) is raised by the IDNA codec for names
+    # like "a..com".
+    except ValueError as e:
+        return invalid_host(domain, e, "addresses")
+    except socket.gaierror as e:
+        reason = f"DNS resolution failed for {host} ({e.strerror})"
+        return {"status": "dead", "reason": reason, "output": f"[!] {reason}\n", "data": {"addresses": []}}
+    except FuturesTimeout:
+        reason = f"DNS resolution for {host} timed out after {PREFLIGHT_DNS_TIMEOUT:g}s"
+        return {"status": "dead", "reason": reason, "output": f"[!] {reason}\n", "data": {"addresses": []}}
+
+    addrs = sorted({info[4][0] for info in infos})
+    return {"status": "ok", "output": "\n".join(addrs) + "\n", "data": {"addresses": addrs}}
+
+
+def probe_web_ports(domain: str, addresses: list[str]) -> dict:
+    # .port raises for "host:abc" or an out-of-range port.
+    try:
+        port = urlparse("//" + domain).port
+    except ValueError as e:
+        return invalid_host(domain, e, "open_ports")
+    ports = (port,) if port else PREFLIGHT_WEB_PORTS
+
+    open_ports = []
+    lines = []
+    for p in ports:
+        state = "closed/filtered"
+        for addr in addresses[:2]:
+            try:
+                with socket.create_connection((addr, p), timeout=PREFLIGHT_CONNECT_TIMEOUT):
+                    state = f"open ({addr})"
+                    open_ports.append(p)
+                    break
+            except OSError:
+                continue
+        lines.append(f"{p}/tcp {state}")
+
+    output = "\n".join(lines) + "\n"
+    if not open_ports:
+        ports_str = "/".join(str(p) for p in ports)
+        reason = f"No reachable web port ({ports_str}) within {PREFLIGHT_CONNECT_TIMEOUT:g}s"
+        return {"status": "dead", "reason": reason, "output": output, "data": {"open_ports": []}}
+    return {"status": "ok", "output": output, "data": {"open_ports": open_ports}}
+
+
+# The URL the HTTP stage should use: an explicit port in the target is kept
+# (plain HTTP only on port 80), otherwise HTTPS unless the preflight found
+# only port 80 open.
+def web_url(domain: str, open_ports) -> str:
+    try:
+        port = urlparse("//" + domain).port
+    except ValueError:
+        port = None
+    if port:
+        scheme = "http" if port == 80 else "https"
+    else:
+        scheme = "http" if open_ports and 443 not in open_ports else "https"
+    return f"{scheme}://{domain}"
+
+
+def http_section(key: str, url_for, command: str = "GET {url}"):
+    def run(results):
+        return {"status": "ok", "output": results["http"]["data"][key], "command": command.format(url=url_for(results))}
+    return run
+
+
+def build_gobuster_args(url: str, wildcard: dict, wordlist: str = "./common.txt") -> list[str]:
+    wild_len = wildcard.get("length")
+    wild_code = wildcard.get("status")
+
+    gobuster_args = ["gobuster", "dir", "-u", url, "-w", wordlist, "-f"]
 
     if wild_len is not None and wild_len > 0:
         gobuster_args += ["--exclude-length", str(wild_len)]
@@ -896,70 +1405,462 @@ def build_tools(domain: str):
         else:
             gobuster_args += ["-b", "404"]
 
+    return gobuster_args
+
+
+def gobuster_wordlist(tier: str, fingerprint: str) -> str:
+    with tracing.span("gobuster_wordlist", tier=tier):
+        techs = wordlists.detect_technologies(fingerprint)
+        return str(wordlists.build_wordlist(tier, technologies=techs).path)
+
+
+# A scan is a graph of nodes. Each node either runs a command ("args", which may
+# be a callable taking the results of its "needs") or a Python function ("run").
+# Nodes with a "title" become report sections; the rest are internal probes.
+# A node whose upstream reports the host as dead is skipped instead of run.
+def build_tools(domain: str, wordlist_tier: str = "common"):
+    # Commands shown before the web preflight has run (and for skipped
+    # tools); the HTTP stage itself uses url_for().
+    url = f"https://{domain}"
+
+    def url_for(results):
+        return web_url(domain, results["web"]["data"]["open_ports"])
+
+    def probe_http(results):
+        target_url = url_for(results)
+        result = http_probe.analyze(target_url)
+        result["command"] = f"GET {target_url} (+ 404 and WAF probes)"
+        return result
+
     return [
-        (["whois", domain.replace("www.", "")], "WHOIS Lookup"),
-        (["nslookup", domain], "NSLookup"),
-        (["dig", domain], "DIG DNS Info"),
-        (["nmap", "-F", domain], "Nmap Fast Scan"),
-        (["curl", "-I", url], "HTTP Headers (curl)"),
-        (["whatweb", url], "WhatWeb Fingerprint"),
-        (["subfinder", "-silent", "-d", domain], "Subdomain Enumeration (subfinder)"),
-        (gobuster_args, "Gobuster Directory Scan"),
-        (["wafw00f", url], "WAF Detection (WAFW00F)"),
+        {"id": "dns", "needs": [], "command": f"resolve {domain}",
+         "run": lambda results: resolve_host(domain), "cache_ttl": 300},
+        {"id": "web", "needs": ["dns"], "command": f"tcp connect {domain} {'/'.join(map(str, PREFLIGHT_WEB_PORTS))}",
+         "run": lambda results: probe_web_ports(domain, results["dns"]["data"]["addresses"]), "cache_ttl": 60},
+        {"id": "http", "needs": ["web"], "command": f"GET {url} (+ 404 and WAF probes)",
+         "run": probe_http, "cache_ttl": 300},
+
+        {"id": "whois", "title": "WHOIS Lookup", "needs": [],
+         "args": ["saber-whois", domain.replace("www.", "")], "cache_ttl": 3600},
+        {"id": "nslookup", "title": "NSLookup", "needs": [], "args": ["nslookup", domain]},
+        {"id": "dig", "title": "DIG DNS Info", "needs": [], "args": ["dig", domain]},
+        {"id": "nmap", "title": "Nmap Fast Scan", "needs": ["dns"], "args": ["nmap", "-F", domain]},
+        {"id": "headers", "title": "HTTP Headers", "needs": ["http"], "command": f"GET {url}",
+         "run": http_section("headers", url_for)},
+        {"id": "fingerprint", "title": "Technology Fingerprint", "needs": ["http"], "command": f"GET {url}",
+         "run": http_section("fingerprint", url_for)},
+        {"id": "subfinder", "title": "Subdomain Enumeration (subfinder)", "needs": ["dns"],
+         "args": ["subfinder", "-silent", "-d", domain], "empty_output": "No subdomains found.\n"},
+        {"id": "gobuster", "title": "Gobuster Directory Scan", "needs": ["http"],
+         "args": lambda results: build_gobuster_args(
+             url_for(results),
+             results["http"]["data"]["wildcard"],
+             gobuster_wordlist(wordlist_tier, results["http"]["data"]["fingerprint"]),
+         )},
+        {"id": "waf", "title": "WAF Detection (WAFW00F signatures)", "needs": ["http"],
+         "command": f"GET {url} and {url}/?<attack strings>", "run": http_section("waf", url_for, "GET {url} and {url}/?<attack strings>")},
     ]
 
-def render_report_html(target: str, domain: str, sections: list[dict]) -> str:
-    env = Environment(
+
+MAX_PARALLEL_NODES = 4
+
+NODE_CACHE = {}
+NODE_CACHE_LOCK = threading.Lock()
+
+
+def node_cache_get(key):
+    with NODE_CACHE_LOCK:
+        hit = NODE_CACHE.get(key)
+        if hit is None:
+            return None
+        expires, result = hit
+        if expires < time.monotonic():
+            NODE_CACHE.pop(key, None)
+            return None
+        return dict(result)
+
+
+# Only clean successes are cached. Failures (timeouts, DNS or HTTP errors,
+# a dead preflight, a failed WHOIS lookup) are often transient, and caching
+# them would replay the error or skip whole branches on the next scan.
+def cacheable(result: dict) -> bool:
+    return result["status"] == "ok" and not result["output"].startswith("[!] ")
+
+
+def node_cache_put(key, result: dict, ttl: int) -> None:
+    with NODE_CACHE_LOCK:
+        NODE_CACHE[key] = (time.monotonic() + ttl, dict(result))
+
+
+# `info`, when given, receives how long the node took and whether the
+# result came from the node cache.
+def run_node(node: dict, results: dict, info: dict | None = None) -> dict:
+    start = time.monotonic()
+    with tracing.profiled(), tracing.span(f"node {node['id']}") as attrs:
+        result = _run_node(node, results, attrs)
+        attrs["status"] = result["status"]
+    if info is not None:
+        info.update(seconds=time.monotonic() - start, cached=attrs.get("cached", False))
+    return result
+
+
+def _run_node(node: dict, results: dict, attrs: dict) -> dict:
+    args = node.get("args")
+    if callable(args):
+        args = args(results)
+    command = " ".join(args) if args else node.get("command", node["id"])
+
+    ttl = node.get("cache_ttl", 0)
+    key = (node["id"], command)
+    if ttl:
+        cached = node_cache_get(key)
+        if cached is not None:
+            attrs["cached"] = True
+            return cached
+
+    if node.get("run"):
+        result = node["run"](results)
+    else:
+        output = run_cmd(args, timeout=node.get("timeout", 90))
+        if not output.strip() and node.get("empty_output"):
+            output = node["empty_output"]
+        result = {"status": "ok", "output": output}
+    result.setdefault("command", command)
+
+    if ttl and cacheable(result):
+        node_cache_put(key, result, ttl)
+    return result
+
+
+def skip_result(node: dict, upstream: dict) -> dict:
+    reason = upstream.get("reason") or "upstream step did not complete"
+    args = node.get("args")
+    command = " ".join(args) if isinstance(args, list) else node.get("command", node["id"])
+    return {"status": "skipped", "reason": reason, "command": command, "output": f"[-] Skipped: {reason}\n"}
+
+
+PROGRESS_INTERVAL = 1.0
+
+# A running node is never shown as more than this share done, however far
+# past its estimate it is.
+RUNNING_CREDIT_MAX = 0.95
+
+
+# Seconds until every node is done, assuming each pending node starts as
+# soon as its needs finish: the longest remaining path through the graph.
+def estimate_remaining(nodes: list[dict], results: dict, started: dict, estimates: dict, now: float) -> float:
+    finish = {}
+
+    def finish_at(node):
+        node_id = node["id"]
+        if node_id not in finish:
+            if node_id in results:
+                finish[node_id] = 0.0
+            elif node_id in started:
+                finish[node_id] = max(estimates[node_id] - (now - started[node_id]), 0.5)
+            else:
+                needs = [by_id[n] for n in node.get("needs", [])]
+                finish[node_id] = max((finish_at(n) for n in needs), default=0.0) + estimates[node_id]
+        return finish[node_id]
+
+    by_id = {n["id"]: n for n in nodes}
+    return max((finish_at(n) for n in nodes), default=0.0)
+
+
+# `done` holds results from an earlier, interrupted run; those nodes are not
+# run again. `on_result` is called with the results so far after each node.
+# `estimates` maps node id to expected seconds; with it, progress is weighted
+# by expected duration and carries an ETA. `on_timing(node_id, seconds)` is
+# called for every node that actually ran and succeeded; failures, dead
+# preflights and cache hits would drag the estimates toward zero.
+def run_graph(nodes: list[dict], progress_cb=None, done=None, on_result=None, estimates=None, on_timing=None) -> dict:
+    ids = {n["id"] for n in nodes}
+    for node in nodes:
+        missing = [n for n in node.get("needs", []) if n not in ids]
+        if missing:
+            raise ValueError(f"Node {node['id']} needs unknown node(s): {', '.join(missing)}")
+
+    total = sum(1 for n in nodes if n.get("title"))
+    results = {k: v for k, v in (done or {}).items() if k in ids}
+    pending = [n for n in nodes if n["id"] not in results]
+    running = {}
+    started = {}
+    infos = {}
+    weights = {n["id"]: estimates.get(n["id"], 1.0) if estimates else (1.0 if n.get("title") else 0.0) for n in nodes}
+    total_weight = sum(weights.values())
+    began = time.monotonic()
+    last_stage = ["Starting..."]
+
+    def report(stage=None):
+        if not progress_cb:
+            return
+        if stage:
+            last_stage[0] = stage
+        now = time.monotonic()
+        done = sum(1 for n in nodes if n.get("title") and n["id"] in results)
+        credit = sum(weights[i] for i in results)
+        credit += sum(weights[i] * min((now - t) / weights[i], RUNNING_CREDIT_MAX) for i, t in started.items() if weights[i] and i not in results)
+        payload = {
+            "percent": min(int((credit / total_weight) * 100), 99) if total_weight else 100,
+            "stage": last_stage[0],
+            "current": done,
+            "total": total,
+            "elapsed": round(now - began, 1),
+        }
+        if estimates:
+            payload["eta_seconds"] = round(estimate_remaining(nodes, results, started, weights, now), 1)
+        progress_cb(payload)
+
+    if results:
+        report(f"Resuming: {sum(1 for n in nodes if n.get('title') and n['id'] in results)} of {total} already done")
+
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_NODES) as pool:
+        while pending or running:
+            scheduled = True
+            while scheduled:
+                scheduled = False
+                for node in list(pending):
+                    needs = node.get("needs", [])
+                    if any(n not in results for n in needs):
+                        continue
+                    pending.remove(node)
+                    scheduled = True
+
+                    blocked = next((results[n] for n in needs if results[n]["status"] != "ok"), None)
+                    if blocked is not None:
+                        results[node["id"]] = skip_result(node, blocked)
+                        if on_result:
+                            on_result(results)
+                        if node.get("title"):
+                            report(f"Skipped: {node['title']}")
+                        continue
+
+                    started[node["id"]] = time.monotonic()
+                    infos[node["id"]] = {}
+                    if node.get("title"):
+                        report(f"Running: {node['title']}")
+                    # Each node runs in a copy of this context so it joins the current trace.
+                    fut = pool.submit(contextvars.copy_context().run, run_node, node, dict(results), infos[node["id"]])
+                    running[fut] = node
+
+            if not running:
+                if pending:
+                    raise ValueError("Scan graph has a dependency cycle: " + ", ".join(n["id"] for n in pending))
+                break
+
+            # Wake up now and then while tools run so the percentage and ETA
+            # keep moving between completions.
+            finished, _ = wait(running, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+            if not finished:
+                report()
+                continue
+            for fut in finished:
+                node = running.pop(fut)
+                results[node["id"]] = fut.result()
+                info = infos.pop(node["id"])
+                result = results[node["id"]]
+                if on_timing and not info.get("cached") and result["status"] == "ok" and not result["output"].startswith("[!] "):
+                    on_timing(node["id"], info["seconds"])
+                if on_result:
+                    on_result(results)
+                if node.get("title"):
+                    report(f"Completed: {node['title']}")
+
+    return results
+
+
+@lru_cache(maxsize=1)
+def get_report_env():
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+    return Environment(
         loader=FileSystemLoader("templates"),
         autoescape=select_autoescape(["html", "xml"]),
     )
-    template = env.get_template("report_template.html")
 
-    logo_data_uri = build_data_uri_for_logo(Path("static") / "SaberShieldLogoWithText.png")
 
-    return template.render(
-        target=target,
-        domain=domain,
-        timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        sections=sections,
-        logo_data_uri=logo_data_uri,
+REPORT_LOGO_PATH = Path("static") / "SaberShieldLogoWithText.png"
+
+
+@lru_cache(maxsize=1)
+def report_logo_data_uri() -> str | None:
+    return build_data_uri_for_logo(REPORT_LOGO_PATH)
+
+
+def _with_full_output(sections):
+    for s in sections:
+        s = dict(s)
+        m = SPILL_RE.search(s.get("output", ""))
+        if m:
+            s["full_output"] = m.group(1)
+        yield s
+
+
+def _report_context(target, domain, sections, timestamp, logo_data_uri) -> dict:
+    return {
+        "target": target,
+        "domain": domain,
+        "timestamp": timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "sections": _with_full_output(sections),
+        "logo_data_uri": logo_data_uri or report_logo_data_uri(),
+    }
+
+
+def render_report_html(target: str, domain: str, sections: list[dict], timestamp: str | None = None, logo_data_uri: str | None = None) -> str:
+    template = get_report_env().get_template("report_template.html")
+    with tracing.span("render_report_html", sections=len(sections)):
+        return template.render(**_report_context(target, domain, sections, timestamp, logo_data_uri))
+
+
+def preflight_section(nodes: list[dict], results: dict) -> dict:
+    dns = results["dns"]
+    if dns["status"] == "ok":
+        lines = ["DNS: " + ", ".join(dns["data"]["addresses"])]
+    else:
+        lines = [f"DNS: {dns['reason']}"]
+    if "web" in results:
+        web = results["web"]
+        lines.append("Web ports:")
+        lines += [f"  {line}" for line in web["output"].strip().splitlines()]
+
+    skipped = [n for n in nodes if n.get("title") and results[n["id"]]["status"] == "skipped"]
+    if skipped:
+        lines.append("")
+        lines.append("Skipped tools:")
+        lines += [f"  - {n['title']}: {results[n['id']]['reason']}" for n in skipped]
+    else:
+        lines.append("")
+        lines.append("All tools were run.")
+
+    return {
+        "title": "Pre-flight Check",
+        "command": " && ".join(results[i]["command"] for i in ("dns", "web") if i in results),
+        "output": "\n".join(lines) + "\n",
+    }
+
+
+# Indexing is best effort; a broken index must never fail a scan.
+def index_written_report(name: str, target: str, domain: str, sections: list[dict], mtime: float) -> None:
+    try:
+        search_index.index_report(name, target, domain, sections, mtime)
+    except (OSError, sqlite3.Error):
+        pass
+
+
+# Reports are stored as a manifest of content-addressed blobs (section
+# outputs and the logo), so identical outputs across scans are kept once.
+# The self-contained HTML is rendered from the manifest when asked for.
+def write_report(path: Path, target: str, domain: str, sections: list[dict]) -> None:
+    assets = {}
+    try:
+        assets["logo"] = REPORT_LOGO_PATH.read_bytes()
+    except OSError:
+        pass
+    with tracing.span("write_report", report=path.name):
+        with tracing.span("blob_store.save_report"):
+            manifest = blob_store.save_report(path.name, target, domain, sections, assets)
+        with tracing.span("search_index.index_report"):
+            index_written_report(path.name, target, domain, sections, manifest.stat().st_mtime)
+
+
+def stored_logo_data_uri(manifest: dict) -> str | None:
+    logo = manifest.get("assets", {}).get("logo")
+    if not logo:
+        return None
+    try:
+        mime = mimetypes.guess_type(str(REPORT_LOGO_PATH))[0] or "image/png"
+        return f"data:{mime};base64," + base64.b64encode(blob_store.get(logo)).decode("ascii")
+    except (OSError, zlib.error):
+        return None
+
+
+def stored_report_html(name: str) -> str | None:
+    manifest = blob_store.load_manifest(name)
+    if manifest is None:
+        return None
+
+    return render_report_html(
+        target=manifest["target"],
+        domain=manifest["domain"],
+        sections=blob_store.load_sections(manifest),
+        timestamp=manifest["timestamp"],
+        logo_data_uri=stored_logo_data_uri(manifest),
+    )
+
+
+# Renders a stored report piece by piece, reading one section's output blob
+# at a time, so a download never holds the whole report in memory.
+def stream_stored_report(name: str):
+    manifest = blob_store.load_manifest(name)
+    if manifest is None:
+        return None
+
+    template = get_report_env().get_template("report_template.html")
+    context = _report_context(
+        manifest["target"], manifest["domain"], blob_store.iter_sections(manifest),
+        manifest["timestamp"], stored_logo_data_uri(manifest),
     )
+    return template.generate(**context)
 
 
-def run_recon_and_write_html(target: str, output_html_path: Path, progress_cb=None) -> None:
+# Every finished node is checkpointed next to the report, so a scan that is
+# interrupted (restart, crash) picks up where it left off on the next run
+# for the same report and only re-runs the missing tools.
+def run_recon_and_write_html(target: str, output_html_path: Path, progress_cb=None, wordlist_tier: str = "common") -> None:
     domain = normalize_target(target)
     if not domain:
         raise ValueError("Target is empty or invalid.")
 
-    tools = build_tools(domain)
-    total = len(tools)
+    name = output_html_path.name
+    state = checkpoints.load(name)
+    if not state or state.get("domain") != domain or state.get("wordlist") != wordlist_tier:
+        state = {"target": target, "domain": domain, "wordlist": wordlist_tier, "filename": name, "results": {}}
+    state["attempts"] = state.get("attempts", 0) + 1
+    state["error"] = None
 
-    sections = []
-    for i, (args, title) in enumerate(tools, start=1):
-        if progress_cb:
-            progress_cb({
-                "percent": int(((i - 1) / total) * 100),
-                "stage": f"Running: {title}",
-                "current": i - 1,
-                "total": total,
-            })
+    def save_checkpoint(results):
+        state["results"] = results
+        try:
+            with tracing.span("checkpoint.save", completed=len(results)):
+                checkpoints.save(name, state)
+        except OSError:
+            pass
 
-        output = run_cmd(args, timeout=90)
-        if title.startswith("Subdomain Enumeration") and not output.strip():
-            output = "No subdomains found.\n"
+    save_checkpoint(state["results"])
+    try:
+        with tracing.span("build_tools"):
+            nodes = build_tools(domain, wordlist_tier=wordlist_tier)
 
-        sections.append({"title": title, "command": " ".join(args), "output": output})
+        # Progress is weighted by how long each tool has taken on similar targets.
+        cls = timings.target_class(domain, wordlist_tier)
+        durations = {}
+        with tracing.span("run_graph", nodes=len(nodes), resumed=len(state["results"])):
+            results = run_graph(
+                nodes,
+                progress_cb=progress_cb,
+                done=state["results"],
+                on_result=save_checkpoint,
+                estimates=timings.estimates(cls, [n["id"] for n in nodes]),
+                on_timing=durations.__setitem__,
+            )
+        timings.record(cls, durations)
+        total = sum(1 for n in nodes if n.get("title"))
 
-        if progress_cb:
-            progress_cb({
-                "percent": int((i / total) * 100),
-                "stage": f"Completed: {title}",
-                "current": i,
-                "total": total,
-            })
+        sections = [preflight_section(nodes, results)]
+        sections += [
+            {"title": n["title"], "command": results[n["id"]]["command"], "output": results[n["id"]]["output"]}
+            for n in nodes
+            if n.get("title")
+        ]
 
-    html = render_report_html(target=target, domain=domain, sections=sections)
-    output_html_path.write_text(html)
+        write_report(output_html_path, target, domain, sections)
+    except Exception as e:
+        # Kept so the finished tools aren't lost, but marked so the scan is
+        # not auto-resumed into the same failure on every restart.
+        state["error"] = str(e) or type(e).__name__
+        save_checkpoint(state["results"])
+        raise
+    checkpoints.remove(name)
 
     if progress_cb:
         progress_cb({
@@ -967,5 +1868,5 @@ def run_recon_and_write_html(target: str, output_html_path: Path, progress_cb=No
             "stage": "Done",
             "current": total,
             "total": total,
+            "eta_seconds": 0,
         })
-
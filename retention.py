@@ -0,0 +1,275 @@
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+import io
+import json
+import os
+import tarfile
+import threading
+import time
+
+import blob_store
+import search_index
+from recon_core import stored_report_html, output_dir, SPILL_RE
+
+# Policies; 0 disables one, and all are off unless configured. Reports past
+# a policy are written to a compressed archive in ARCHIVE_DIR (unless
+# archiving is off) and removed from the live store in batches. Archives
+# are only pruned when ARCHIVE_MAX_BYTES is set.
+MAX_AGE_DAYS = float(os.environ.get("SABERRECON_RETENTION_MAX_AGE_DAYS", "0"))
+MAX_BYTES = int(float(os.environ.get("SABERRECON_RETENTION_MAX_MB", "0")) * 1024 * 1024)
+KEEP_PER_TARGET = int(os.environ.get("SABERRECON_RETENTION_KEEP_PER_TARGET", "0"))
+ARCHIVE = os.environ.get("SABERRECON_RETENTION_ARCHIVE", "1") not in ("", "0", "false")
+ARCHIVE_MAX_BYTES = int(float(os.environ.get("SABERRECON_ARCHIVE_MAX_MB", "0")) * 1024 * 1024)
+
+INTERVAL_SECONDS = int(os.environ.get("SABERRECON_RETENTION_INTERVAL", "3600"))
+INITIAL_DELAY_SECONDS = 60
+BATCH_SIZE = 100
+
+ARCHIVE_DIR = Path("/data") / ".archive"
+
+# The header of a legacy report names its domain within this many bytes.
+LEGACY_HEADER_BYTES = 64 * 1024
+
+_LOCK = threading.Lock()
+STATUS = {"last_run": None, "last_result": None, "running": False}
+
+
+# The target a report belongs to, or None when it can't be told (file names
+# don't say: single-tool reports are named after the tool).
+def target_key(path: Path, manifest: dict | None) -> str | None:
+    if manifest is not None:
+        domain = manifest.get("domain", "")
+    else:
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                domain = search_index.parse_report_html(f.read(LEGACY_HEADER_BYTES))[1]
+        except OSError:
+            domain = ""
+    return domain.strip().lower().removeprefix("www.") or None
+
+
+def collect_reports(data_dir: Path) -> list[dict]:
+    reports = {}
+    for p in data_dir.glob("*.html"):
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        reports[p.name] = {"name": p.name, "path": p, "manifest": None, "mtime": st.st_mtime, "bytes": st.st_size}
+    for p in blob_store.list_manifests():
+        try:
+            manifest = json.loads(p.read_text())
+            st = p.stat()
+        except (OSError, ValueError):
+            continue
+        name = p.name[:-len(".json")]
+        reports[name] = {"name": name, "path": p, "manifest": manifest, "mtime": st.st_mtime, "bytes": st.st_size}
+    for r in reports.values():
+        r["target"] = target_key(r["path"], r["manifest"])
+    return sorted(reports.values(), key=lambda r: r["mtime"])
+
+
+def dir_bytes(d: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(d):
+        for f in files:
+            try:
+                total += os.stat(os.path.join(root, f)).st_size
+            except OSError:
+                continue
+    return total
+
+
+# Bytes held by reports: legacy HTML files, manifests and the blobs they
+# reference. Orphan blobs still inside gc's grace period, spilled tool
+# output (which can't be tied back to a report without reading it) and the
+# index databases are not counted, so the budget never chases bytes that
+# removing reports can't free.
+def live_bytes(data_dir: Path) -> int:
+    legacy = sum(p.stat().st_size for p in data_dir.glob("*.html"))
+    return legacy + blob_store.referenced_bytes() + dir_bytes(blob_store.store_dir() / "manifests")
+
+
+def expired(reports: list[dict], now: float) -> dict:
+    reasons = {}
+    if MAX_AGE_DAYS > 0:
+        cutoff = now - MAX_AGE_DAYS * 86400
+        for r in reports:
+            if r["mtime"] < cutoff:
+                reasons[r["name"]] = f"older than {MAX_AGE_DAYS:g} days"
+    if KEEP_PER_TARGET > 0:
+        by_target = {}
+        for r in reports:
+            if r["target"] is not None:
+                by_target.setdefault(r["target"], []).append(r)
+        for items in by_target.values():
+            for r in items[:-KEEP_PER_TARGET]:
+                reasons.setdefault(r["name"], f"more than {KEEP_PER_TARGET} reports for {r['target']}")
+    return reasons
+
+
+def report_html(r: dict) -> str:
+    if r["manifest"] is not None:
+        return stored_report_html(r["name"]) or ""
+    return r["path"].read_text(errors="replace")
+
+
+def spill_files(r: dict) -> set[str]:
+    if r["manifest"] is None:
+        return set(SPILL_RE.findall(r["path"].read_text(errors="replace")))
+    names = set()
+    for s in blob_store.iter_sections(r["manifest"]):
+        names.update(SPILL_RE.findall(s["output"]))
+    return names
+
+
+# Identical outputs are shared between reports (coalesced runs, node cache
+# replays), spill link included, so a spill file is counted once per report
+# naming it and only deleted when the last of them goes. Each report's
+# names are kept in r["spills"].
+def spill_refs(reports: list[dict]) -> Counter:
+    refs = Counter()
+    for r in reports:
+        try:
+            r["spills"] = spill_files(r)
+        except (OSError, ValueError):
+            r["spills"] = set()
+        refs.update(r["spills"])
+    return refs
+
+
+def archive_dir() -> Path:
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    return ARCHIVE_DIR
+
+
+def archive_batch(batch: list[dict], reasons: dict) -> Path:
+    name = f"reports-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.urandom(2).hex()}.tar.gz"
+    path = archive_dir() / name
+    tmp = path.with_name(f".{name}.tmp")
+    index = []
+    with tarfile.open(tmp, "w:gz") as tar:
+        for r in batch:
+            data = report_html(r).encode("utf-8")
+            info = tarfile.TarInfo(r["name"])
+            info.size = len(data)
+            info.mtime = int(r["mtime"])
+            tar.addfile(info, io.BytesIO(data))
+            index.append({"name": r["name"], "target": r["target"], "mtime": r["mtime"], "reason": reasons.get(r["name"], "")})
+        data = json.dumps(index, indent=1).encode("utf-8")
+        info = tarfile.TarInfo("index.json")
+        info.size = len(data)
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(data))
+    tmp.replace(path)
+    return path
+
+
+def remove_batch(batch: list[dict], refs: Counter) -> None:
+    for r in batch:
+        if r["manifest"] is not None:
+            blob_store.delete_report(r["name"])
+        else:
+            r["path"].unlink(missing_ok=True)
+        for spill in r["spills"]:
+            refs[spill] -= 1
+            if refs[spill] <= 0:
+                (output_dir() / spill).unlink(missing_ok=True)
+    search_index.remove_reports(r["name"] for r in batch)
+
+
+def prune_archives() -> int:
+    if ARCHIVE_MAX_BYTES <= 0 or not ARCHIVE_DIR.is_dir():
+        return 0
+    archives = sorted(ARCHIVE_DIR.glob("*.tar.gz"), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in archives)
+    removed = 0
+    while archives and total > ARCHIVE_MAX_BYTES:
+        p = archives.pop(0)
+        total -= p.stat().st_size
+        p.unlink(missing_ok=True)
+        removed += 1
+    return removed
+
+
+def _retire(batch, reasons, result, refs):
+    if ARCHIVE:
+        result["archives"].append(archive_batch(batch, reasons).name)
+    remove_batch(batch, refs)
+    result["removed"] += len(batch)
+
+
+def run_once(data_dir: Path, skip=()) -> dict:
+    if not _LOCK.acquire(blocking=False):
+        return {"skipped": "retention already running"}
+    STATUS["running"] = True
+    try:
+        now = time.time()
+        everything = collect_reports(data_dir)
+        reports = [r for r in everything if r["name"] not in skip]
+        reasons = expired(reports, now)
+        result = {"removed": 0, "archives": [], "by_policy": len(reasons), "by_budget": 0}
+
+        # Spill references are counted across every report, skipped ones
+        # included, but only once something is going to be removed.
+        refs = spill_refs(everything) if reasons else None
+
+        doomed = [r for r in reports if r["name"] in reasons]
+        for i in range(0, len(doomed), BATCH_SIZE):
+            _retire(doomed[i:i + BATCH_SIZE], reasons, result, refs)
+        blob_store.gc()
+
+        # Oldest reports go first until the live data fits the budget; how
+        # much a report frees is only known after gc, so work in batches and
+        # stop as soon as a batch frees nothing (the rest isn't report data).
+        remaining = [r for r in reports if r["name"] not in reasons]
+        if MAX_BYTES > 0:
+            size = live_bytes(data_dir)
+            while remaining and size > MAX_BYTES:
+                batch, remaining = remaining[:BATCH_SIZE], remaining[BATCH_SIZE:]
+                budget = {r["name"]: f"over the {MAX_BYTES // (1024 * 1024)} MB budget" for r in batch}
+                if refs is None:
+                    refs = spill_refs(everything)
+                _retire(batch, budget, result, refs)
+                result["by_budget"] += len(batch)
+                blob_store.gc()
+                before, size = size, live_bytes(data_dir)
+                if size >= before:
+                    result["budget_stalled"] = True
+                    break
+
+        result["archives_pruned"] = prune_archives()
+        result["live_bytes"] = live_bytes(data_dir)
+        STATUS["last_run"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        STATUS["last_result"] = result
+        return result
+    finally:
+        STATUS["running"] = False
+        _LOCK.release()
+
+
+def policy() -> dict:
+    return {
+        "max_age_days": MAX_AGE_DAYS,
+        "max_bytes": MAX_BYTES,
+        "keep_per_target": KEEP_PER_TARGET,
+        "archive": ARCHIVE,
+        "archive_max_bytes": ARCHIVE_MAX_BYTES,
+        "interval_seconds": INTERVAL_SECONDS,
+    }
+
+
+def start(data_dir: Path, skip=lambda: ()) -> threading.Thread:
+    def loop():
+        time.sleep(INITIAL_DELAY_SECONDS)
+        while True:
+            try:
+                run_once(data_dir, skip=skip())
+            except Exception as e:
+                STATUS["last_result"] = {"error": str(e)}
+            time.sleep(INTERVAL_SECONDS)
+
+    t = threading.Thread(target=loop, name="retention", daemon=True)
+    t.start()
+    return t
@@ -0,0 +1,171 @@
+from datetime import datetime
+from pathlib import Path
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+import uuid
+
+SCHEDULE_PATH = Path("/data") / ".schedules" / "schedules.json"
+
+# At most MAX_CONCURRENT scheduled scans are queued or running at once; due
+# schedules past that wait for the next tick.
+MAX_CONCURRENT = int(os.environ.get("SABERRECON_SCHEDULE_MAX_CONCURRENT", "1"))
+
+# Each run is moved by up to this fraction of its interval (capped at
+# MAX_JITTER_SECONDS) so runs don't drift into lockstep.
+JITTER_FRACTION = 0.1
+MAX_JITTER_SECONDS = 900
+
+MIN_INTERVAL_MINUTES = 15
+TICK_SECONDS = 30
+
+_LOCK = threading.Lock()
+_SCHEDULES = None
+
+
+def schedule_path() -> Path:
+    try:
+        SCHEDULE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        return SCHEDULE_PATH
+    except OSError:
+        return Path(tempfile.gettempdir()) / "saberrecon-schedules.json"
+
+
+def _load() -> dict:
+    global _SCHEDULES
+    if _SCHEDULES is None:
+        try:
+            _SCHEDULES = {s["id"]: s for s in json.loads(schedule_path().read_text())}
+        except (OSError, ValueError):
+            _SCHEDULES = {}
+    return _SCHEDULES
+
+
+def _save() -> None:
+    p = schedule_path()
+    tmp = p.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(list(_SCHEDULES.values()), indent=1))
+    tmp.replace(p)
+
+
+# Where in its interval a schedule fires, derived from its id so schedules
+# created together (or at the same minute of an hour) spread out instead of
+# all firing at once.
+def phase(schedule_id: str, interval: float) -> float:
+    h = int(hashlib.sha256(schedule_id.encode()).hexdigest()[:8], 16)
+    return (h / 0xFFFFFFFF) * interval
+
+
+def jitter(interval: float) -> float:
+    j = min(interval * JITTER_FRACTION, MAX_JITTER_SECONDS)
+    return random.uniform(-j, j)
+
+
+def next_run_after(s: dict, now: float) -> float:
+    interval = s["interval_minutes"] * 60
+    slot = s["created"] + phase(s["id"], interval)
+    if slot <= now:
+        slot += ((now - slot) // interval + 1) * interval
+    return max(now + 1, slot + jitter(interval))
+
+
+def _fmt(ts) -> str:
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") if ts else ""
+
+
+def add(target: str, wordlist: str, interval_minutes: int) -> dict:
+    if interval_minutes < MIN_INTERVAL_MINUTES:
+        raise ValueError(f"Interval must be at least {MIN_INTERVAL_MINUTES} minutes.")
+    now = time.time()
+    s = {
+        "id": uuid.uuid4().hex[:12],
+        "target": target,
+        "wordlist": wordlist,
+        "interval_minutes": interval_minutes,
+        "enabled": True,
+        "created": now,
+        "last_run": None,
+        "last_job": None,
+        "runs": 0,
+        "skipped": 0,
+    }
+    s["next_run"] = next_run_after(s, now)
+    with _LOCK:
+        _load()[s["id"]] = s
+        _save()
+    return s
+
+
+def remove(schedule_id: str) -> bool:
+    with _LOCK:
+        if _load().pop(schedule_id, None) is None:
+            return False
+        _save()
+    return True
+
+
+def set_enabled(schedule_id: str, enabled: bool) -> bool:
+    with _LOCK:
+        s = _load().get(schedule_id)
+        if s is None:
+            return False
+        s["enabled"] = enabled
+        if enabled:
+            s["next_run"] = next_run_after(s, time.time())
+        _save()
+    return True
+
+
+def list_all() -> list[dict]:
+    with _LOCK:
+        items = sorted(_load().values(), key=lambda s: s["next_run"])
+        return [dict(s, next_run_at=_fmt(s["next_run"]) if s["enabled"] else "", last_run_at=_fmt(s["last_run"])) for s in items]
+
+
+# One scheduler pass. `launch(schedule)` queues a scan and returns its job
+# id; `is_active(job_id)` says whether that job is still queued or running.
+# A schedule whose previous scan is still going skips this run rather than
+# stacking a second scan of the same target.
+def tick(launch, is_active, now: float | None = None) -> dict:
+    now = now or time.time()
+    result = {"launched": [], "skipped": [], "deferred": []}
+    with _LOCK:
+        schedules = _load()
+        running = sum(1 for s in schedules.values() if s["last_job"] and is_active(s["last_job"]))
+        due = sorted((s for s in schedules.values() if s["enabled"] and s["next_run"] <= now), key=lambda s: s["next_run"])
+        for s in due:
+            if s["last_job"] and is_active(s["last_job"]):
+                s["skipped"] += 1
+                s["next_run"] = next_run_after(s, now)
+                result["skipped"].append(s["id"])
+                continue
+            if running >= MAX_CONCURRENT:
+                result["deferred"].append(s["id"])
+                continue
+            s["last_job"] = launch(s)
+            s["last_run"] = now
+            s["runs"] += 1
+            s["next_run"] = next_run_after(s, now)
+            running += 1
+            result["launched"].append(s["id"])
+        if result["launched"] or result["skipped"]:
+            _save()
+    return result
+
+
+def start(launch, is_active) -> threading.Thread:
+    def loop():
+        while True:
+            try:
+                tick(launch, is_active)
+            except Exception:
+                pass
+            time.sleep(TICK_SECONDS)
+
+    t = threading.Thread(target=loop, name="scheduler", daemon=True)
+    t.start()
+    return t
@@ -0,0 +1,183 @@
+from pathlib import Path
+import html
+import re
+import sqlite3
+import tempfile
+import threading
+
+INDEX_PATH = Path("/data") / ".index" / "search.db"
+
+SEARCH_LIMIT = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    name TEXT PRIMARY KEY,
+    target TEXT,
+    domain TEXT,
+    mtime REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5(
+    report UNINDEXED,
+    title,
+    command,
+    output,
+    tokenize = "unicode61 tokenchars '._-'"
+);
+CREATE TABLE IF NOT EXISTS section_rows (
+    id INTEGER PRIMARY KEY,
+    report TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS section_rows_report ON section_rows (report);
+"""
+
+# The FTS table can't index its `report` column, so deleting by report would
+# scan every indexed output. section_rows maps each sections rowid to its
+# report; rows are deleted by rowid through it. Version 1 of the schema is
+# the first with it, and older databases are backfilled once on open.
+SCHEMA_VERSION = 1
+
+# Markers FTS5 puts around matches; they can't appear in escaped report text.
+_HL_START = "\x02"
+_HL_END = "\x03"
+
+_SECTION_RE = re.compile(
+    r'<details class="section"[^>]*>.*?<summary class="section-title">\s*<span>(.*?)</span>'
+    r'.*?<b[^>]*>Command:</b>(.*?)(?:·|</div>).*?<pre>(.*?)</pre>',
+    re.S,
+)
+_KV_RE = re.compile(r"<b>(Target|Domain):</b>\s*<div class=\"val\">(.*?)</div>", re.S)
+
+_LOCK = threading.Lock()
+_CONN = None
+
+
+def _connect() -> sqlite3.Connection:
+    global _CONN
+    if _CONN is None:
+        path = INDEX_PATH
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            path = Path(tempfile.gettempdir()) / "saberrecon-search.db"
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            with conn:
+                conn.execute("DELETE FROM section_rows")
+                conn.execute("INSERT INTO section_rows (id, report) SELECT rowid, report FROM sections")
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        _CONN = conn
+    return _CONN
+
+
+def _delete_sections(conn: sqlite3.Connection, names) -> None:
+    for name in names:
+        ids = conn.execute("SELECT id FROM section_rows WHERE report = ?", (name,)).fetchall()
+        conn.executemany("DELETE FROM sections WHERE rowid = ?", ids)
+        conn.execute("DELETE FROM section_rows WHERE report = ?", (name,))
+
+
+def index_report(name: str, target: str, domain: str, sections: list[dict], mtime: float) -> None:
+    rows = [(name, s.get("title", ""), s.get("command", ""), s.get("output", "")) for s in sections]
+    with _LOCK:
+        conn = _connect()
+        with conn:
+            _delete_sections(conn, [name])
+            for row in rows:
+                rowid = conn.execute("INSERT INTO sections (report, title, command, output) VALUES (?, ?, ?, ?)", row).lastrowid
+                conn.execute("INSERT INTO section_rows (id, report) VALUES (?, ?)", (rowid, name))
+            conn.execute(
+                "INSERT OR REPLACE INTO reports (name, target, domain, mtime) VALUES (?, ?, ?, ?)",
+                (name, target, domain, mtime),
+            )
+
+
+def remove_reports(names) -> None:
+    names = list(names)
+    if not names:
+        return
+    with _LOCK:
+        conn = _connect()
+        with conn:
+            _delete_sections(conn, names)
+            conn.executemany("DELETE FROM reports WHERE name = ?", [(n,) for n in names])
+
+
+def parse_report_html(text: str) -> tuple[str, str, list[dict]]:
+    kv = {k: html.unescape(v.strip()) for k, v in _KV_RE.findall(text)}
+    sections = [
+        {"title": html.unescape(t.strip()), "command": html.unescape(c.strip()), "output": html.unescape(o)}
+        for t, c, o in _SECTION_RE.findall(text)
+    ]
+    return kv.get("Target", ""), kv.get("Domain", ""), sections
+
+
+# Brings the index in line with the reports that exist. `sources` maps a
+# report name to (mtime, load) where load() returns (target, domain,
+# sections); new or rewritten reports are (re)indexed and rows for deleted
+# reports are dropped.
+def sync(sources: dict) -> dict:
+    with _LOCK:
+        known = dict(_connect().execute("SELECT name, mtime FROM reports").fetchall())
+
+    indexed = 0
+    for name, (mtime, load) in sources.items():
+        if known.get(name) == mtime:
+            continue
+        try:
+            target, domain, sections = load()
+            index_report(name, target, domain, sections, mtime)
+            indexed += 1
+        except (OSError, ValueError, sqlite3.Error):
+            continue
+
+    stale = [name for name in known if name not in sources]
+    remove_reports(stale)
+    return {"indexed": indexed, "removed": len(stale), "total": len(sources)}
+
+
+def fts_query(q: str) -> str:
+    terms = []
+    for term in q.split():
+        prefix = term.endswith("*")
+        term = term.rstrip("*").replace('"', '""')
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def _snippet_html(snippet: str) -> str:
+    return html.escape(snippet).replace(_HL_START, "<mark>").replace(_HL_END, "</mark>")
+
+
+def search(q: str, limit: int = SEARCH_LIMIT, offset: int = 0) -> dict:
+    match = fts_query(q)
+    if not match:
+        return {"query": q, "total": 0, "results": []}
+
+    with _LOCK:
+        conn = _connect()
+        try:
+            total = conn.execute("SELECT count(*) FROM sections WHERE sections MATCH ?", (match,)).fetchone()[0]
+            rows = conn.execute(
+                f"""
+                SELECT s.report, s.title, r.target, r.mtime,
+                       snippet(sections, 3, '{_HL_START}', '{_HL_END}', '…', 16),
+                       bm25(sections, 0.0, 4.0, 2.0, 1.0)
+                FROM sections s LEFT JOIN reports r ON r.name = s.report
+                WHERE sections MATCH ?
+                ORDER BY bm25(sections, 0.0, 4.0, 2.0, 1.0)
+                LIMIT ? OFFSET ?
+                """,
+                (match, limit, offset),
+            ).fetchall()
+        except sqlite3.OperationalError as e:
+            return {"query": q, "total": 0, "results": [], "error": str(e)}
+
+    results = [
+        {"report": report, "title": title, "target": target or "", "mtime": mtime, "snippet": _snippet_html(snip), "score": -score}
+        for report, title, target, mtime, snip, score in rows
+    ]
+    return {"query": q, "total": total, "results": results}
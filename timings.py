@@ -0,0 +1,123 @@
+from pathlib import Path
+from urllib.parse import urlparse
+import ipaddress
+import json
+import os
+import tempfile
+import threading
+
+TIMINGS_PATH = Path("/data") / ".timings" / "timings.json"
+
+# Seconds a node is expected to take before any history exists for it.
+DEFAULT_SECONDS = {
+    "dns": 1, "web": 2, "http": 3,
+    "whois": 3, "nslookup": 1, "dig": 1, "nmap": 30, "subfinder": 30, "gobuster": 90,
+    "headers": 0.1, "fingerprint": 0.1, "waf": 0.1,
+}
+FALLBACK_SECONDS = 5
+
+# Weight of the newest run in the moving average, so estimates follow a
+# tool that gets slower or faster without one outlier swinging them.
+ALPHA = 0.3
+
+# History kept across all target classes, used until a class has its own.
+ANY_CLASS = "*"
+
+_LOCK = threading.Lock()
+_HISTORY = None
+
+
+def timings_path() -> Path:
+    try:
+        TIMINGS_PATH.parent.mkdir(parents=True, exist_ok=True)
+        return TIMINGS_PATH
+    except OSError:
+        return Path(tempfile.gettempdir()) / "saberrecon-timings.json"
+
+
+def _load() -> dict:
+    global _HISTORY
+    if _HISTORY is None:
+        try:
+            _HISTORY = json.loads(timings_path().read_text())
+        except (OSError, ValueError):
+            _HISTORY = {}
+        if not isinstance(_HISTORY, dict):
+            _HISTORY = {}
+    return _HISTORY
+
+
+def _save() -> None:
+    p = timings_path()
+    tmp = p.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(_HISTORY, indent=1))
+    tmp.replace(p)
+
+
+# Tool runtimes depend mostly on the wordlist tier (gobuster) and on whether
+# the target is a bare IP (no WHOIS/subdomains worth the name) or a domain.
+def target_class(domain: str, wordlist_tier: str) -> str:
+    host = urlparse("//" + domain).hostname or domain
+    try:
+        ipaddress.ip_address(host)
+        kind = "ip"
+    except ValueError:
+        kind = "domain"
+    return f"{kind}/{wordlist_tier}"
+
+
+# An entry from a hand-edited or older timings file may be malformed; that
+# counts as no history.
+def _bucket(history: dict, key: str) -> dict:
+    bucket = history.get(key)
+    return bucket if isinstance(bucket, dict) else {}
+
+
+def _avg(entry) -> float | None:
+    if not isinstance(entry, dict):
+        return None
+    avg = entry.get("avg")
+    if not isinstance(avg, (int, float)) or isinstance(avg, bool) or avg < 0:
+        return None
+    return avg
+
+
+def estimates(cls: str, node_ids) -> dict:
+    with _LOCK:
+        history = _load()
+        own = _bucket(history, cls)
+        shared = _bucket(history, ANY_CLASS)
+        out = {}
+        for node_id in node_ids:
+            avg = _avg(own.get(node_id))
+            if avg is None:
+                avg = _avg(shared.get(node_id))
+            out[node_id] = DEFAULT_SECONDS.get(node_id, FALLBACK_SECONDS) if avg is None else avg
+        return out
+
+
+def record(cls: str, durations: dict) -> None:
+    if not durations:
+        return
+    with _LOCK:
+        history = _load()
+        for key in (cls, ANY_CLASS):
+            bucket = history[key] = _bucket(history, key)
+            for node_id, seconds in durations.items():
+                entry = bucket.get(node_id)
+                avg = _avg(entry)
+                if avg is None:
+                    bucket[node_id] = {"avg": round(seconds, 3), "runs": 1}
+                else:
+                    entry["avg"] = round(avg + ALPHA * (seconds - avg), 3)
+                    runs = entry.get("runs")
+                    entry["runs"] = runs + 1 if isinstance(runs, int) else 1
+        try:
+            _save()
+        except OSError:
+            pass
+
+
+def snapshot() -> dict:
+    with _LOCK:
+        return json.loads(json.dumps(_load()))
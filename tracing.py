@@ -0,0 +1,298 @@
+from contextlib import contextmanager
+from pathlib import Path
+import contextvars
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+TRACE_DIR = Path("/data") / ".traces"
+
+# Tracing is opt-in per scan; these turn it on for every scan. With an OTLP
+# endpoint set (e.g. http://localhost:4318/v1/traces) finished traces are
+# also posted there as OTLP/HTTP JSON.
+TRACE_ALL = os.environ.get("SABERRECON_TRACE", "") not in ("", "0", "false")
+PROFILE_ALL = os.environ.get("SABERRECON_PROFILE", "") not in ("", "0", "false")
+OTLP_ENDPOINT = os.environ.get("SABERRECON_OTLP_ENDPOINT", "")
+OTLP_TIMEOUT = 5
+SERVICE_NAME = "saberrecon"
+
+# Spans past this are dropped so a runaway trace can't grow without bound.
+MAX_SPANS = 10000
+
+SAFE_NAME_CHARS = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.-")
+
+_TRACE = contextvars.ContextVar("trace", default=None)
+_PARENT = contextvars.ContextVar("trace_parent", default=None)
+_PROFILING = threading.local()
+
+
+class Trace:
+    def __init__(self, name: str, profile: bool = False):
+        self.name = name
+        self.trace_id = os.urandom(16).hex()
+        self.start_ns = time.time_ns()
+        self.profile = profile
+        self.spans = []
+        self.profilers = []
+        self.notes = []
+        self.lock = threading.Lock()
+
+    def add(self, span: dict) -> None:
+        with self.lock:
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append(span)
+
+
+def active() -> bool:
+    return _TRACE.get() is not None
+
+
+# Times the enclosed block as a span of the current trace. Outside a trace
+# it does nothing. The yielded dict is the span's attributes, so callers can
+# add to it as they learn more (cache hit, exit status, ...).
+@contextmanager
+def span(name: str, **attrs):
+    trace = _TRACE.get()
+    if trace is None:
+        yield attrs
+        return
+
+    parent = _PARENT.get()
+    span_id = os.urandom(8).hex()
+    token = _PARENT.set(span_id)
+    thread = threading.current_thread()
+    start = time.time_ns()
+    try:
+        yield attrs
+    except BaseException as e:
+        attrs["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _PARENT.reset(token)
+        trace.add({
+            "name": name,
+            "span_id": span_id,
+            "parent": parent,
+            "start_ns": start,
+            "end_ns": time.time_ns(),
+            "tid": thread.ident,
+            "thread": thread.name,
+            "attrs": attrs,
+        })
+
+
+# Before 3.12 a cProfile profiler only sees the thread it was enabled in, so
+# each thread that does work for a profiled trace gets its own profiler and
+# they are merged when the trace finishes. From 3.12 cProfile sits on
+# sys.monitoring: one profiler sees every thread, and only one may be active
+# in the whole process.
+PROCESS_WIDE_PROFILER = sys.version_info >= (3, 12)
+
+# Held by the one profiled trace allowed at a time.
+_PROFILE_LOCK = threading.Lock()
+
+
+def profiling_active() -> bool:
+    return _PROFILE_LOCK.locked()
+
+
+def _enable(prof) -> bool:
+    try:
+        prof.enable()
+        return True
+    except ValueError:
+        # Another profiler (e.g. a debugger's) is already active.
+        return False
+
+
+@contextmanager
+def _collect(trace: Trace):
+    prof = cProfile.Profile()
+    started = _enable(prof)
+    try:
+        yield
+    finally:
+        if started:
+            prof.disable()
+            with trace.lock:
+                trace.profilers.append(prof)
+
+
+# Profiles the calling thread for the current trace. A no-op where the
+# trace's process-wide profiler already covers it.
+@contextmanager
+def profiled():
+    trace = _TRACE.get()
+    if trace is None or not trace.profile or PROCESS_WIDE_PROFILER or getattr(_PROFILING, "on", False):
+        yield
+        return
+
+    _PROFILING.on = True
+    try:
+        with _collect(trace):
+            yield
+    finally:
+        _PROFILING.on = False
+
+
+@contextmanager
+def _profile_trace(t: Trace):
+    if not t.profile:
+        yield
+        return
+    try:
+        if PROCESS_WIDE_PROFILER:
+            with _collect(t):
+                yield
+        else:
+            with profiled():
+                yield
+    finally:
+        _PROFILE_LOCK.release()
+
+
+# Only one trace is profiled at a time; a second one asking for a profile
+# while another is running is traced without it and says so in `t.notes`.
+@contextmanager
+def trace(name: str, profile: bool = False, **attrs):
+    t = Trace(name, profile)
+    if profile and not _PROFILE_LOCK.acquire(blocking=False):
+        t.profile = False
+        t.notes.append("not profiled: another profiled job was running")
+    token = _TRACE.set(t)
+    try:
+        with _profile_trace(t), span(name, **attrs):
+            yield t
+    finally:
+        _TRACE.reset(token)
+        finish(t)
+
+
+def trace_dir() -> Path:
+    try:
+        TRACE_DIR.mkdir(parents=True, exist_ok=True)
+        return TRACE_DIR
+    except OSError:
+        fallback = Path(tempfile.gettempdir()) / "saberrecon-traces"
+        fallback.mkdir(parents=True, exist_ok=True)
+        return fallback
+
+
+def trace_path(name: str) -> Path:
+    if not name or not set(name) <= SAFE_NAME_CHARS:
+        raise ValueError("Invalid trace name.")
+    return trace_dir() / f"{name}.json"
+
+
+def profile_path(name: str) -> Path:
+    return trace_path(name).with_suffix(".prof")
+
+
+# Chrome trace event format; opens in Perfetto (ui.perfetto.dev) and
+# chrome://tracing.
+def chrome_trace(t: Trace) -> dict:
+    tids = {}
+    events = []
+    for s in sorted(t.spans, key=lambda s: s["start_ns"]):
+        if s["tid"] not in tids:
+            tids[s["tid"]] = len(tids) + 1
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tids[s["tid"]], "args": {"name": s["thread"]}})
+        events.append({
+            "name": s["name"],
+            "cat": s["name"].split(" ")[0],
+            "ph": "X",
+            "pid": 1,
+            "tid": tids[s["tid"]],
+            "ts": (s["start_ns"] - t.start_ns) / 1000,
+            "dur": (s["end_ns"] - s["start_ns"]) / 1000,
+            "args": {k: str(v) for k, v in s["attrs"].items()},
+        })
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {"trace": t.name, "trace_id": t.trace_id, "spans": len(t.spans), "notes": t.notes},
+    }
+
+
+def _otlp_value(v) -> dict:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def otlp_payload(t: Trace) -> dict:
+    spans = []
+    for s in t.spans:
+        item = {
+            "traceId": t.trace_id,
+            "spanId": s["span_id"],
+            "name": s["name"],
+            "kind": 1,
+            "startTimeUnixNano": str(s["start_ns"]),
+            "endTimeUnixNano": str(s["end_ns"]),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s["attrs"].items()],
+            "status": {"code": 2, "message": s["attrs"]["error"]} if "error" in s["attrs"] else {},
+        }
+        if s["parent"]:
+            item["parentSpanId"] = s["parent"]
+        spans.append(item)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": SERVICE_NAME}, "spans": spans}],
+        }]
+    }
+
+
+def export_otlp(t: Trace, endpoint: str = "") -> bool:
+    endpoint = endpoint or OTLP_ENDPOINT
+    if not endpoint:
+        return False
+    req = urllib.request.Request(
+        endpoint,
+        data=json.dumps(otlp_payload(t)).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=OTLP_TIMEOUT) as resp:
+            return 200 <= resp.status < 300
+    except OSError:
+        return False
+
+
+# Tracing is best effort; a failure to write or export must never fail the
+# job being traced.
+def finish(t: Trace) -> None:
+    try:
+        p = trace_path(t.name)
+        tmp = p.with_suffix(".tmp")
+        tmp.write_text(json.dumps(chrome_trace(t)))
+        tmp.replace(p)
+        if t.profilers:
+            stats = pstats.Stats(t.profilers[0])
+            for prof in t.profilers[1:]:
+                stats.add(prof)
+            stats.dump_stats(profile_path(t.name))
+    except (OSError, ValueError):
+        pass
+    if OTLP_ENDPOINT:
+        threading.Thread(target=export_otlp, args=(t,), name="otlp-export", daemon=True).start()
+
+
+def profile_text(name: str, limit: int = 60, sort: str = "cumulative") -> str:
+    buf = io.StringIO()
+    stats = pstats.Stats(str(profile_path(name)), stream=buf)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return buf.getvalue()
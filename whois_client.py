@@ -0,0 +1,320 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlsplit
+import argparse
+import ipaddress
+import json
+import re
+import socket
+import tempfile
+import threading
+import time
+import urllib.request
+
+IANA_SERVER = "whois.iana.org"
+RDAP_BOOTSTRAP_URL = "https://data.iana.org/rdap/dns.json"
+
+CACHE_DIR = Path("/data") / ".whois"
+
+QUERY_TIMEOUT = 10
+MAX_RESPONSE_BYTES = 1024 * 1024
+MAX_REFERRALS = 2
+REFERRAL_TTL = 3600
+MAX_CACHED_LOOKUPS = 1024
+BULK_WORKERS = 16
+
+# Seed map; anything else is discovered through IANA once and remembered.
+TLD_SERVERS = {
+    "com": "whois.verisign-grs.com",
+    "net": "whois.verisign-grs.com",
+    "org": "whois.pir.org",
+    "info": "whois.nic.info",
+    "io": "whois.nic.io",
+    "co": "whois.nic.co",
+    "me": "whois.nic.me",
+    "us": "whois.nic.us",
+    "uk": "whois.nic.uk",
+    "de": "whois.denic.de",
+    "fr": "whois.nic.fr",
+    "nl": "whois.domain-registry.nl",
+    "eu": "whois.eu",
+    "ca": "whois.cira.ca",
+    "au": "whois.auda.org.au",
+    "dev": "whois.nic.google",
+    "app": "whois.nic.google",
+}
+
+# How some registries want the query phrased.
+QUERY_FORMATS = {
+    "whois.verisign-grs.com": "domain {q}",
+    "whois.denic.de": "-T dn,ace {q}",
+    "whois.jprs.jp": "{q}/e",
+}
+
+# Queries per second and burst size per server; registries throttle hard.
+RATE_LIMITS = {
+    "default": (1.0, 3),
+    "whois.iana.org": (2.0, 4),
+    "whois.verisign-grs.com": (5.0, 10),
+}
+
+REFERRAL_RE = re.compile(
+    r"^\s*(?:Registrar WHOIS Server|ReferralServer|Whois Server|refer|whois):\s*(\S+)\s*$",
+    re.I | re.M,
+)
+
+_LOCK = threading.Lock()
+_BUCKETS = {}
+_REFERRALS = {}
+_RDAP_BOOTSTRAP = {}
+_TLD_LOADED = False
+
+
+def cache_path(name: str) -> Path:
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        return CACHE_DIR / name
+    except OSError:
+        d = Path(tempfile.gettempdir()) / "saberrecon-whois"
+        d.mkdir(parents=True, exist_ok=True)
+        return d / name
+
+
+def _load_tld_map():
+    global _TLD_LOADED
+    with _LOCK:
+        if _TLD_LOADED:
+            return
+        _TLD_LOADED = True
+    try:
+        saved = json.loads(cache_path("tld_servers.json").read_text())
+    except (OSError, ValueError):
+        return
+    with _LOCK:
+        for tld, server in saved.items():
+            TLD_SERVERS.setdefault(tld, server)
+
+
+def _save_tld_map():
+    with _LOCK:
+        data = json.dumps(TLD_SERVERS, indent=1, sort_keys=True)
+    try:
+        p = cache_path("tld_servers.json")
+        tmp = p.with_suffix(".tmp")
+        tmp.write_text(data)
+        tmp.replace(p)
+    except OSError:
+        pass
+
+
+# Seconds left before `deadline` (a time.monotonic() value), capped at one
+# query's timeout. Raises once the deadline has passed.
+def remaining(deadline: float | None, cap: float = QUERY_TIMEOUT) -> float:
+    if deadline is None:
+        return cap
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise TimeoutError("timed out")
+    return min(cap, left)
+
+
+def throttle(server: str, deadline: float | None = None) -> None:
+    rate, burst = RATE_LIMITS.get(server, RATE_LIMITS["default"])
+    while True:
+        with _LOCK:
+            now = time.monotonic()
+            tokens, last = _BUCKETS.get(server, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            if tokens >= 1:
+                _BUCKETS[server] = (tokens - 1, now)
+                return
+            _BUCKETS[server] = (tokens, now)
+            wait = (1 - tokens) / rate
+        if deadline is not None and time.monotonic() + wait >= deadline:
+            raise TimeoutError("timed out waiting for the rate limit")
+        time.sleep(wait)
+
+
+def query(server: str, q: str, deadline: float | None = None) -> str:
+    throttle(server, deadline)
+    line = QUERY_FORMATS.get(server, "{q}").format(q=q)
+    chunks = []
+    size = 0
+    with socket.create_connection((server, 43), timeout=remaining(deadline)) as sock:
+        sock.sendall(line.encode("utf-8") + b"\r\n")
+        while size < MAX_RESPONSE_BYTES:
+            sock.settimeout(remaining(deadline))
+            data = sock.recv(65536)
+            if not data:
+                break
+            chunks.append(data)
+            size += len(data)
+    return b"".join(chunks).decode("utf-8", errors="replace")
+
+
+def is_ip(q: str) -> bool:
+    try:
+        ipaddress.ip_address(q)
+        return True
+    except ValueError:
+        return False
+
+
+def normalize_query(q: str) -> str:
+    q = q.strip().rstrip(".").lower()
+    if is_ip(q):
+        return q
+    try:
+        return q.encode("idna").decode("ascii")
+    except UnicodeError:
+        return q
+
+
+def server_for(q: str, deadline: float | None = None) -> str:
+    if is_ip(q):
+        return IANA_SERVER
+    _load_tld_map()
+    tld = q.rsplit(".", 1)[-1]
+    with _LOCK:
+        server = TLD_SERVERS.get(tld)
+    if server:
+        return server
+
+    text = query(IANA_SERVER, tld, deadline)
+    m = re.search(r"^(?:refer|whois):\s*(\S+)", text, re.I | re.M)
+    if not m:
+        return IANA_SERVER
+    with _LOCK:
+        TLD_SERVERS[tld] = m.group(1).lower()
+    _save_tld_map()
+    return m.group(1).lower()
+
+
+def referral_of(text: str, current: str) -> str | None:
+    for m in REFERRAL_RE.finditer(text):
+        server = m.group(1).strip().lower()
+        if "://" in server:
+            server = urlsplit(server).hostname or ""
+        server = server.split(":")[0]
+        if server and server != current and "." in server:
+            return server
+    return None
+
+
+# Cached chains past their TTL are dropped on every insert, and the oldest
+# ones go once more than MAX_CACHED_LOOKUPS are left.
+def _remember(key, chain) -> None:
+    now = time.monotonic()
+    with _LOCK:
+        for k in [k for k, (expires, _) in _REFERRALS.items() if expires <= now]:
+            del _REFERRALS[k]
+        _REFERRALS.pop(key, None)
+        _REFERRALS[key] = (now + REFERRAL_TTL, chain)
+        while len(_REFERRALS) > MAX_CACHED_LOOKUPS:
+            del _REFERRALS[next(iter(_REFERRALS))]
+
+
+def lookup(q: str, server: str | None = None, follow=True, deadline: float | None = None) -> list[tuple[str, str]]:
+    q = normalize_query(q)
+    key = (q, server, follow)
+    with _LOCK:
+        hit = _REFERRALS.get(key)
+        if hit and hit[0] > time.monotonic():
+            return hit[1]
+
+    server = server or server_for(q, deadline)
+    chain = []
+    for _ in range(MAX_REFERRALS + 1):
+        text = query(server, q, deadline)
+        chain.append((server, text))
+        nxt = referral_of(text, server) if follow else None
+        if not nxt or any(nxt == s for s, _ in chain):
+            break
+        server = nxt
+
+    _remember(key, chain)
+    return chain
+
+
+def format_chain(chain) -> str:
+    return "\n".join(f"[{server}]\n{text.strip()}\n" for server, text in chain)
+
+
+def rdap_base(q: str, deadline: float | None = None) -> str | None:
+    with _LOCK:
+        services = _RDAP_BOOTSTRAP.get("services")
+    if services is None:
+        with urllib.request.urlopen(RDAP_BOOTSTRAP_URL, timeout=remaining(deadline)) as resp:
+            services = json.load(resp)["services"]
+        with _LOCK:
+            _RDAP_BOOTSTRAP["services"] = services
+
+    tld = q.rsplit(".", 1)[-1]
+    for tlds, urls in services:
+        if tld in tlds and urls:
+            return urls[0]
+    return None
+
+
+def rdap_lookup(q: str, deadline: float | None = None) -> str:
+    q = normalize_query(q)
+    base = rdap_base(q, deadline)
+    if not base:
+        return f"[!] No RDAP service for {q}\n"
+    url = f"{base.rstrip('/')}/domain/{q}"
+    throttle(urlsplit(url).hostname, deadline)
+    req = urllib.request.Request(url, headers={"Accept": "application/rdap+json"})
+    with urllib.request.urlopen(req, timeout=remaining(deadline)) as resp:
+        data = json.load(resp)
+
+    lines = [f"[{url}]", f"Domain Name: {data.get('ldhName', q)}"]
+    for status in data.get("status", []):
+        lines.append(f"Domain Status: {status}")
+    for event in data.get("events", []):
+        lines.append(f"{event.get('eventAction', 'event').title()}: {event.get('eventDate', '')}")
+    for entity in data.get("entities", []):
+        vcard = entity.get("vcardArray", [None, []])[1]
+        name = next((v[3] for v in vcard if v and v[0] == "fn"), entity.get("handle", ""))
+        lines.append(f"{', '.join(entity.get('roles', [])).title()}: {name}")
+    for ns in data.get("nameservers", []):
+        lines.append(f"Name Server: {ns.get('ldhName', '')}")
+    return "\n".join(lines) + "\n"
+
+
+def lookup_text(q: str, server: str | None = None, follow=True, rdap=False, deadline: float | None = None) -> str:
+    try:
+        if rdap:
+            return rdap_lookup(q, deadline)
+        return format_chain(lookup(q, server=server, follow=follow, deadline=deadline))
+    except (OSError, ValueError) as e:
+        return f"[!] WHOIS lookup for {q} failed: {e}\n"
+
+
+# Lookups run concurrently; throttle() keeps each server within its limits.
+# Pass a `deadline` to bound the whole batch: lookups still waiting or
+# running when it passes report a timeout instead.
+def bulk_lookup(queries: list[str], workers=BULK_WORKERS, **kwargs) -> dict:
+    unique = list(dict.fromkeys(q for q in queries if q))
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(unique)))) as pool:
+        texts = pool.map(lambda q: lookup_text(q, **kwargs), unique)
+    return dict(zip(unique, texts))
+
+
+# `timeout` bounds the whole run, however many domains and referrals it takes.
+def main(argv: list[str], timeout: float = 90) -> str:
+    parser = argparse.ArgumentParser(prog="saber-whois", add_help=False)
+    parser.add_argument("-h", dest="server", default=None)
+    parser.add_argument("--rdap", action="store_true")
+    parser.add_argument("--no-referral", action="store_true")
+    parser.add_argument("queries", nargs="+")
+    try:
+        opts = parser.parse_args(argv)
+    except SystemExit:
+        return f"[!] Invalid arguments: saber-whois {' '.join(argv)}\n"
+
+    deadline = time.monotonic() + timeout
+    kwargs = {"server": opts.server, "follow": not opts.no_referral, "rdap": opts.rdap, "deadline": deadline}
+    if len(opts.queries) == 1:
+        return lookup_text(opts.queries[0], **kwargs)
+    results = bulk_lookup(opts.queries, **kwargs)
+    return "\n".join(f"===== {q} =====\n{text}" for q, text in results.items())
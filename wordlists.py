@@ -0,0 +1,219 @@
+from pathlib import Path
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+CACHE_DIR = Path("/data") / ".wordlists"
+
+TIERS = {
+    "tiny": ["wordlists/tiny.txt"],
+    "common": ["common.txt"],
+    "large": [
+        "common.txt",
+        "wordlists/large.txt",
+        "/usr/share/seclists/Discovery/Web-Content/directory-list-2.3-medium.txt",
+        "/usr/share/wordlists/dirb/big.txt",
+    ],
+}
+
+# Extra paths worth trying once a technology shows up in the fingerprint.
+TECH_WORDLISTS = {
+    "WordPress": {
+        "match": r"wordpress|wp-content",
+        "words": [
+            "wp-admin", "wp-admin/admin-ajax.php", "wp-content", "wp-content/plugins", "wp-content/themes",
+            "wp-content/uploads", "wp-content/debug.log", "wp-includes", "wp-json", "wp-json/wp/v2/users",
+            "wp-login.php", "wp-cron.php", "wp-config.php.bak", "wp-config.php~", "xmlrpc.php",
+            "readme.html", "license.txt",
+        ],
+    },
+    "Drupal": {
+        "match": r"drupal",
+        "words": [
+            "user/login", "user/register", "node", "core/CHANGELOG.txt", "CHANGELOG.txt", "sites/default",
+            "sites/default/files", "sites/default/settings.php", "modules", "themes", "update.php", "install.php",
+        ],
+    },
+    "Joomla": {
+        "match": r"joomla",
+        "words": [
+            "administrator", "administrator/manifests/files/joomla.xml", "components", "modules", "plugins",
+            "templates", "language/en-GB/en-GB.xml", "configuration.php.bak", "htaccess.txt",
+        ],
+    },
+    "PHP": {
+        "match": r"\bphp\b",
+        "words": ["phpinfo.php", "info.php", "test.php", "index.php", "composer.json", "composer.lock", "vendor", ".env"],
+    },
+    "Apache": {
+        "match": r"\bapache\b(?![-_]coyote)",
+        "words": ["server-status", "server-info", ".htaccess", ".htpasswd", "cgi-bin/", "icons/"],
+    },
+    "Nginx": {
+        "match": r"\bnginx\b",
+        "words": ["nginx_status", "nginx.conf", "status"],
+    },
+    "IIS": {
+        "match": r"microsoft-iis|asp[._]net",
+        "words": ["web.config", "aspnet_client", "trace.axd", "elmah.axd", "default.aspx", "App_Data", "bin"],
+    },
+    "Tomcat": {
+        "match": r"tomcat|apache[-_]coyote|jsessionid",
+        "words": ["manager/html", "host-manager/html", "WEB-INF/web.xml", "META-INF/MANIFEST.MF", "examples", "status"],
+    },
+    "Laravel": {
+        "match": r"laravel",
+        "words": [".env", "storage/logs/laravel.log", "artisan", "telescope", "horizon", "_ignition/health-check"],
+    },
+    "Django": {
+        "match": r"django|csrftoken",
+        "words": ["admin/", "static/", "media/", "__debug__/", "api/"],
+    },
+    "Express": {
+        "match": r"express",
+        "words": ["package.json", "package-lock.json", "node_modules", ".npmrc", "server.js", "app.js"],
+    },
+    "Spring": {
+        "match": r"spring|whitelabel error",
+        "words": [
+            "actuator", "actuator/health", "actuator/env", "actuator/mappings", "actuator/heapdump",
+            "actuator/configprops", "swagger-ui.html", "v2/api-docs", "v3/api-docs",
+        ],
+    },
+}
+
+_SOURCES = {}
+_COMPILED = {}
+_LOCK = threading.Lock()
+
+
+# A compiled list is a deduplicated text file in CACHE_DIR, named by the
+# hash of its contents, that gobuster reads from `path`.
+class Wordlist:
+    def __init__(self, name: str, path: Path, entries: list[str]):
+        self.name = name
+        self.path = path
+        self.entries = entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __getitem__(self, i: int) -> str:
+        return self.entries[i]
+
+    def __iter__(self):
+        return iter(self.entries)
+
+
+def normalize_entries(lines) -> list[str]:
+    seen = set()
+    out = []
+    for line in lines:
+        word = line.strip()
+        if not word or word.startswith("#"):
+            continue
+        word = word.lstrip("/")
+        if not word or word in seen:
+            continue
+        seen.add(word)
+        out.append(word)
+    return out
+
+
+def load_wordlist_file(path) -> list[str]:
+    p = Path(path)
+    try:
+        mtime = p.stat().st_mtime
+    except FileNotFoundError:
+        return []
+
+    with _LOCK:
+        hit = _SOURCES.get(p)
+        if hit and hit[0] == mtime:
+            return hit[1]
+
+    entries = normalize_entries(p.read_text(encoding="utf-8", errors="replace").splitlines())
+    with _LOCK:
+        _SOURCES[p] = (mtime, entries)
+    return entries
+
+
+def merge(*lists) -> list[str]:
+    return normalize_entries(word for words in lists for word in words)
+
+
+def exclude(base, *others) -> list[str]:
+    drop = {w.lstrip("/") for words in others for w in words}
+    return [w for w in base if w not in drop]
+
+
+def tier_entries(tier: str) -> list[str]:
+    if tier not in TIERS:
+        raise ValueError(f"Unknown wordlist tier: {tier}")
+    return merge(*(load_wordlist_file(p) for p in TIERS[tier]))
+
+
+# A tier is offered only when one of its own sources (one no earlier tier
+# lists) is present, so `large` doesn't show up as a copy of `common` in a
+# container without SecLists, dirb or wordlists/large.txt.
+def available_tiers() -> list[str]:
+    seen = set()
+    out = []
+    for tier, sources in TIERS.items():
+        if any(p not in seen and Path(p).is_file() for p in sources):
+            out.append(tier)
+        seen.update(sources)
+    return out
+
+
+def detect_technologies(fingerprint: str) -> list[str]:
+    text = fingerprint or ""
+    return [tech for tech, spec in TECH_WORDLISTS.items() if re.search(spec["match"], text, re.I)]
+
+
+def cache_dir() -> Path:
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        return CACHE_DIR
+    except OSError:
+        fallback = Path(tempfile.gettempdir()) / "saberrecon-wordlists"
+        fallback.mkdir(parents=True, exist_ok=True)
+        return fallback
+
+
+# The file is written to a private temp file outside the lock, so a large
+# list doesn't hold up every other scan; the lock only covers publishing it.
+def compile_wordlist(name: str, entries: list[str]) -> Wordlist:
+    data = "\n".join(entries).encode("utf-8") + b"\n"
+    key = f"{name}-{hashlib.sha1(data).hexdigest()[:12]}"
+
+    with _LOCK:
+        if key in _COMPILED:
+            return _COMPILED[key]
+
+    path = cache_dir() / f"{key}.txt"
+    if not path.exists():
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{key}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    with _LOCK:
+        return _COMPILED.setdefault(key, Wordlist(key, path, entries))
+
+
+def build_wordlist(tier: str = "common", technologies=(), exclude_entries=()) -> Wordlist:
+    entries = tier_entries(tier)
+    name = tier
+    if technologies:
+        entries = merge(entries, *(TECH_WORDLISTS[t]["words"] for t in technologies))
+        name += "+" + "+".join(t.lower() for t in technologies)
+    if exclude_entries:
+        entries = exclude(entries, exclude_entries)
+    return compile_wordlist(name, entries)